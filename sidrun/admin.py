@@ -1,22 +1,34 @@
+import json
+
+from django.conf.urls import patterns, url
 from django.contrib import admin
+from django.contrib.admin import helpers
 from django.contrib.admin.models import LogEntry
+from django.contrib.admin.util import unquote, display_for_value
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
 from django.contrib.admin.templatetags.admin_urls import add_preserved_filters
-from django.contrib.auth.models import User, Group
-from django.contrib.contenttypes.models import ContentType
 from django.core.urlresolvers import reverse
-from django.db.models import TextField, Q, CharField
-from django.http import HttpResponseRedirect
+from django.db.models import TextField, CharField, F, Max
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseRedirect, HttpResponse, HttpResponseNotAllowed
+from django.template.response import TemplateResponse
 from django.utils import timezone
 from django.utils.encoding import force_text
+from django.utils.html import format_html
 from django.utils.translation import ugettext as _
 from django.contrib.admin.templatetags.admin_modify import *
 from django.contrib.admin.templatetags.admin_modify import submit_row as original_submit_row
 from django.contrib import messages
 from django_summernote.widgets import SummernoteWidget
 
-from sidrun import models
-from sidrun.forms import CustomForm, AddTaskForm
-from sidrun.models import AdminTask, Task, Tag, Type, InternTask, HelpText, AdminHelpText
+from sidrun import models, roles, search, export, bulk, live_status
+from sidrun.conditional import ConditionalChangeViewMixin
+from sidrun.instrumentation import timed
+from sidrun.forms import CustomForm, AddTaskForm, ImportTasksForm, CloneTasksForm
+from sidrun.models import AdminTask, Task, Tag, Type, InternTask, HelpText, AdminHelpText, accepted_count_expression
+from sidrun.paginators import EstimatedCountPaginator
+from sidrun.roles import user_is_admin
+from sidrun.services import accept_task, count_pending_tasks, TaskAcceptanceError
 
 
 @register.inclusion_tag('admin/submit_line.html', takes_context=True)
@@ -34,23 +46,11 @@ def submit_row(context):
     return ctx
 
 
-def calculate_time_left(obj):
-    return obj.task.time_to_complete_task * 3600 - (timezone.now() - obj.time_started).seconds
-
-
-def overtime(obj):
-    if type(obj) == str or type(obj) == int:
-        obj = InternTask.objects.get(id=obj)
-    time_left = calculate_time_left(obj)
-    return 0 > time_left
-
-
 def show_interntask_as_readonly(obj, request):
-    return (obj.status == models.InternTask.ABANDONED
-            or obj.status == models.InternTask.FINISHED
+    return (obj.status != models.InternTask.UNFINISHED
             or request.GET.get('preview')
-            or overtime(obj)
-            or request.user.groups.filter(name='admins').exists())
+            or obj.overtime()
+            or user_is_admin(request.user))
 
 
 def show_task_as_readonly(obj, request):
@@ -60,9 +60,69 @@ def show_task_as_readonly(obj, request):
         return False
 
 
-class ViewNewTasks(admin.ModelAdmin):
+class DeferringChangeList(ChangeList):
+    """
+    Change list that does not load the columns listed in list_deferred_fields of the model admin.
+    """
+    def get_queryset(self, request):
+        queryset = super(DeferringChangeList, self).get_queryset(request)
+        return queryset.defer(*self.model_admin.list_deferred_fields)
+
+
+def json_response(data, status=200):
+    return HttpResponse(json.dumps(data), content_type='application/json', status=status)
+
+
+class RequestObjectCacheMixin(object):
+    """
+    Loads the object of a change view once per request, so change_view, get_fieldsets, get_readonly_fields and
+    response_change all work with the same instance.
+    """
+    def get_object(self, request, object_id):
+        objects = request.__dict__.setdefault('_admin_objects', {})
+        key = (self.model, force_text(object_id))
+        if key not in objects:
+            objects[key] = super(RequestObjectCacheMixin, self).get_object(request, object_id)
+        return objects[key]
+
+
+def submission_export_action(format, raw_html=False):
+    def action(modeladmin, request, queryset):
+        return export.streaming_response(export.submission_rows(queryset, raw_html=raw_html), format, 'submissions')
+    action.__name__ = 'export_submissions_%s%s' % (format, '_with_html' if raw_html else '')
+    action.short_description = 'Export selected submissions as %s%s' % (
+        format.upper(), ' with HTML' if raw_html else '')
+    return action
+
+
+def task_statistics_export_action(format):
+    def action(modeladmin, request, queryset):
+        return export.streaming_response(export.task_statistics_rows(queryset), format, 'task-statistics')
+    action.__name__ = 'export_task_statistics_%s' % format
+    action.short_description = 'Export statistics of selected tasks as %s' % format.upper()
+    return action
+
+
+class SearchDocumentMixin(object):
+    """
+    Searches the search documents maintained by sidrun.search and lists the best matches first, unless the user
+    has sorted the list by a column.
+    """
+    search_fields = ('search_document',)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        queryset = search.search(queryset, search_term)
+        if ORDER_VAR not in request.GET:
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset, False
+
+
+class ViewNewTasks(SearchDocumentMixin, ConditionalChangeViewMixin, RequestObjectCacheMixin, admin.ModelAdmin):
     list_display = ('title_safe', 'type', 'type_icon', 'available_positions', 'deadline',
                     'time_to_complete_task')
+    list_filter = ('type', 'tags', 'submission_type')
     readonly_fields = ('title_safe', 'tags_list', 'type', 'type_icon', 'description_safe', 'requirements_safe', 'submission_type',
                        'start_date', 'deadline', 'time_to_complete_task', 'number_of_positions', 'available_positions',)
     fields = ['title_safe', 'description_safe', 'requirements_safe', 'submission_type', 'deadline', 'time_to_complete_task',
@@ -78,15 +138,18 @@ class ViewNewTasks(admin.ModelAdmin):
 
     def get_queryset(self, request):
         queryset = super(ViewNewTasks, self).get_queryset(request)
-        now = timezone.now()
-        return queryset.exclude(interntask__user=request.user) \
-            .filter(start_date__lte=now).\
-            extra(where=["deadline > now() + interval '1 hour' * time_to_complete_task ",
-                         "number_of_positions > (SELECT COUNT(*) FROM sidrun_interntask WHERE sidrun_interntask.task_id = sidrun_task.id AND status != 'AB')"])
+        return queryset.select_related('type') \
+            .exclude(interntask__user=request.user) \
+            .filter(number_of_positions__gt=accepted_count_expression()) \
+            .open_for_accepting()
+
+    def change_view_validators(self, request, obj):
+        # the queryset leaves out tasks that can not be accepted any more
+        return (obj.type.name, obj.type.icon_hash), obj.updated_at
 
     def change_view(self, request, object_id, form_url='', extra_context=None):
-        intern_tasks_of_user = request.user.interntask_set.filter(task_id=object_id)
-        user_has_accepted_task = bool(intern_tasks_of_user.count())
+        # tasks the user has accepted are left out of the queryset
+        user_has_accepted_task = self.get_object(request, unquote(object_id)) is None
         if not user_has_accepted_task:
             extra_context = {
                 'show_save_and_continue': False,
@@ -99,57 +162,36 @@ class ViewNewTasks(admin.ModelAdmin):
         return super(ViewNewTasks, self).change_view(request, object_id,
                                                      form_url, extra_context=extra_context)
 
-    def get_n_pending_tasks(self, pending_tasks):
-        counter = 0
-        pending_tasks = pending_tasks.filter(Q(status=InternTask.UNFINISHED)).all()
-        for task in pending_tasks:
-            if not overtime(task):
-                counter += 1
-        return counter
+    def save_model(self, request, obj, form, change):
+        # all fields are read-only, accepting the task in response_change is the only change
+        pass
 
     def response_change(self, request, obj):
         """
         Determines the HttpResponse for the change_view stage.
         """
         opts = self.model._meta
-        pk_value = obj._get_pk_val()
         preserved_filters = self.get_preserved_filters(request)
         user = request.user
-        if '_accept' in request.POST and not self.user_has_accepted_task(obj, user):
-            pending_tasks = user.interntask_set
-            n_pending_tasks = self.get_n_pending_tasks(pending_tasks)
-            allowed_number_of_pending_tasks = user.profile.allowed_number_of_tasks
-            msg = ''
-            if allowed_number_of_pending_tasks <= n_pending_tasks:
-                msg = _('You are allowed to have %d pending tasks. You already have %d pending task(s)! ' % (
-                    allowed_number_of_pending_tasks, n_pending_tasks))
-                self.message_user(request, msg, messages.WARNING)
-            if pending_tasks.filter(task=obj):
-                msg += _('You already have this task!')
-                self.message_user(request, msg, messages.WARNING)
-            if allowed_number_of_pending_tasks > n_pending_tasks and not pending_tasks.filter(task=obj):
-                new_intern_task = pending_tasks.create(task=obj, user=user, status=models.InternTask.UNFINISHED)
-                new_intern_task_pk = new_intern_task._get_pk_val()
-                n_pending_tasks = self.get_n_pending_tasks(pending_tasks)
-                msg = _(
-                    'Task %s was assigned to you. You now have %d pending task(s).' % (
-                        obj.title, n_pending_tasks))
-                redirect_url = reverse('admin:%s_%s_change' %
-                                       (opts.app_label, 'interntask'),
-                                       args=(new_intern_task_pk,),
-                                       current_app=self.admin_site.name)
-                self.message_user(request, msg, messages.SUCCESS, extra_tags='safe')
-                redirect_url = add_preserved_filters({'preserved_filters': preserved_filters, 'opts': opts}, redirect_url)
-                return HttpResponseRedirect(redirect_url)
-            return self.response_post_save_change(request, obj)
+        if '_accept' in request.POST:
+            try:
+                new_intern_task = accept_task(obj, user)
+            except TaskAcceptanceError as e:
+                self.message_user(request, _(force_text(e)), messages.WARNING)
+                return self.response_post_save_change(request, obj)
+            msg = _(
+                'Task %s was assigned to you. You now have %d pending task(s).' % (
+                    obj.title, count_pending_tasks(user)))
+            redirect_url = reverse('admin:%s_%s_change' %
+                                   (opts.app_label, 'interntask'),
+                                   args=(new_intern_task.pk,),
+                                   current_app=self.admin_site.name)
+            self.message_user(request, msg, messages.SUCCESS, extra_tags='safe')
+            redirect_url = add_preserved_filters({'preserved_filters': preserved_filters, 'opts': opts}, redirect_url)
+            return HttpResponseRedirect(redirect_url)
         else:
             return super(ViewNewTasks, self).response_change(request, obj)
 
-    @staticmethod
-    def user_has_accepted_task(obj, user):
-        intern_tasks_of_user = obj.interntask_set.filter(user=user)
-        return bool(intern_tasks_of_user.count())
-
 
 class AcceptedInterntasks(admin.TabularInline):
     model = InternTask
@@ -157,7 +199,7 @@ class AcceptedInterntasks(admin.TabularInline):
     readonly_fields = ('user', 'status', 'time_started', 'time_ended', 'overtime', 'link')
 
     def link(self, obj):
-        if obj.status == InternTask.FINISHED or obj.status == InternTask.ABANDONED or overtime(obj):
+        if obj.status != InternTask.UNFINISHED or obj.overtime():
             opts = self.model._meta
             interntask_url = reverse('admin:%s_%s_change' %
                                    (opts.app_label, 'interntask'),
@@ -170,14 +212,21 @@ class AcceptedInterntasks(admin.TabularInline):
 
     link.allow_tags = True
 
+    @timed('AcceptedInterntasks.overtime')
     def overtime(self, obj):
-        return overtime(obj)
+        return obj.overtime()
+
+    def get_queryset(self, request):
+        return super(AcceptedInterntasks, self).get_queryset(request).select_related('user', 'task')\
+            .with_deadline_state()
 
 
-class TaskForAdmin(admin.ModelAdmin):
+class TaskForAdmin(SearchDocumentMixin, ConditionalChangeViewMixin, RequestObjectCacheMixin, admin.ModelAdmin):
     list_display = (
         'title_safe', 'type', 'tags_list', 'submission_type', 'time_to_complete_task', 'start_date', 'deadline',
         'number_of_positions', 'number_of_users_accepted')
+    list_filter = ('type', 'tags', 'submission_type', 'start_date')
+    actions = ['clone_tasks'] + [task_statistics_export_action(format) for format in export.FORMATS]
     fields = ['title', 'type', 'tags', 'description', 'requirements', 'submission_type', 'time_to_complete_task',
                      'deadline', 'number_of_positions', 'expected_results', 'extra_material', 'require_references', 'require_videos']
     readonly_fields = ('start_date',)
@@ -185,8 +234,74 @@ class TaskForAdmin(admin.ModelAdmin):
     inlines = [AcceptedInterntasks]
     formfield_overrides = {TextField: {'widget': SummernoteWidget()}, CharField: {'widget': SummernoteWidget()}}
 
+    def get_queryset(self, request):
+        return super(TaskForAdmin, self).get_queryset(request).select_related('type').prefetch_related('tags')
+
+    def get_urls(self):
+        opts = self.model._meta
+        urls = patterns('',
+            url(r'^import/$', self.admin_site.admin_view(self.import_view),
+                name='%s_%s_import' % (opts.app_label, opts.model_name)),
+        )
+        return urls + super(TaskForAdmin, self).get_urls()
+
+    def import_view(self, request):
+        """
+        Creates the tasks of an uploaded CSV or JSON file at once, see sidrun.bulk.
+        """
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ImportTasksForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            try:
+                text = form.cleaned_data['file'].read().decode('utf-8-sig')
+                records = bulk.read_records(text, form.cleaned_data['format'])
+                tasks = bulk.import_tasks(records, publish=form.cleaned_data['publish'])
+            except UnicodeDecodeError:
+                self.message_user(request, 'The file has to be UTF-8 encoded.', messages.ERROR)
+            except bulk.TaskImportError as e:
+                for error in e.errors:
+                    self.message_user(request, error, messages.ERROR)
+            else:
+                self.message_user(request, 'Imported %d task(s).' % len(tasks), messages.SUCCESS)
+                opts = self.model._meta
+                return HttpResponseRedirect(reverse('admin:%s_%s_changelist' % (opts.app_label, opts.model_name),
+                                                    current_app=self.admin_site.name))
+        context = {
+            'title': 'Import tasks',
+            'form': form,
+            'opts': self.model._meta,
+            'media': self.media + form.media,
+        }
+        return TemplateResponse(request, 'admin/sidrun/import_tasks.html', context,
+                                current_app=self.admin_site.name)
+
+    def clone_tasks(self, request, queryset):
+        form = CloneTasksForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            try:
+                tasks = bulk.clone_tasks(queryset, form.cleaned_data['deadline'],
+                                         publish=form.cleaned_data['publish'])
+            except bulk.TaskImportError as e:
+                for error in e.errors:
+                    self.message_user(request, error, messages.ERROR)
+            else:
+                self.message_user(request, 'Created %d task(s).' % len(tasks), messages.SUCCESS)
+                return None
+        context = {
+            'title': 'Clone tasks',
+            'form': form,
+            'queryset': queryset,
+            'opts': self.model._meta,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'media': self.media + form.media,
+        }
+        return TemplateResponse(request, 'admin/sidrun/clone_tasks.html', context,
+                                current_app=self.admin_site.name)
+    clone_tasks.short_description = 'Clone selected tasks with a new deadline'
+
     def number_of_users_accepted(self, obj):
-        return obj.interntask_set.all().count()
+        return obj.accepted_count() + obj.abandoned_count
 
     def get_form(self, request, obj=None, **kwargs):
         modelform = super(TaskForAdmin, self).get_form(request, obj, **kwargs)
@@ -214,9 +329,19 @@ class TaskForAdmin(admin.ModelAdmin):
             fieldsets[0][1].update({'fields': fields_})
         return fieldsets
 
+    def change_view_validators(self, request, obj):
+        if not show_task_as_readonly(obj, request):
+            return None
+        # accepted tasks turn overtime without being saved
+        overdue_at = obj.interntask_set.filter(status=InternTask.UNFINISHED, due_at__lt=timezone.now()) \
+            .aggregate(overdue_at=Max('due_at'))['overdue_at']
+        parts = [obj.type.name, overdue_at] + sorted(tag.name for tag in obj.tags.all())
+        return parts, max(obj.updated_at, overdue_at or obj.updated_at)
+
     def change_view(self, request, object_id, form_url='', extra_context=None):
         is_preview = bool(request.GET.get('preview'))
-        start_date = Task.objects.get(id=object_id).start_date
+        obj = self.get_object(request, unquote(object_id))
+        start_date = obj and obj.start_date
         if start_date:
             extra_context = {
                 'show_save_and_continue': False
@@ -278,24 +403,95 @@ class TaskForAdmin(admin.ModelAdmin):
             return super(TaskForAdmin, self).response_add(request, obj)
 
 
-def user_is_admin(user):
-    return user.groups.filter(name='admins').exists()
-
-
-class Dashboard(admin.ModelAdmin):
+class Dashboard(SearchDocumentMixin, RequestObjectCacheMixin, admin.ModelAdmin):
     form = CustomForm
-    list_display = ('type', 'name', 'time_started', 'time_left_or_ended', 'status')
+    list_display = ('type', 'name', 'time_started', 'time_left_or_ended', 'status_label')
     list_display_links = ('name',)
+    list_filter = ('status', 'task__type')
     readonly_fields = (
         'time_left_or_ended', 'time_started', 'status', 'name', 'description', 'requirements', 'submission_type',
         'expected_results', 'deadline', 'extra_material',)
     fields = ['name', 'description', 'requirements', 'submission_type', 'time_started', 'deadline',
               'time_left_or_ended',
               'expected_results', 'extra_material', 'summary_pitch', 'body', 'conclusion', 'references', 'videos']
+    list_deferred_fields = ('summary_pitch', 'body', 'conclusion', 'references', 'videos', 'search_document',
+                            'task__description', 'task__requirements', 'task__expected_results',
+                            'task__extra_material', 'task__search_document')
+    autosave_fields = ('summary_pitch', 'body', 'conclusion', 'references', 'videos')
     can_delete = False
-    actions = None
+    # only offered to admins, see get_actions
+    actions = [submission_export_action('csv'), submission_export_action('jsonl'),
+               submission_export_action('jsonl', raw_html=True)]
     formfield_overrides = {TextField: {'widget': SummernoteWidget()}}
 
+    def get_urls(self):
+        opts = self.model._meta
+        urls = patterns('',
+            url(r'^status/$', self.admin_site.admin_view(self.status_view),
+                name='%s_%s_status' % (opts.app_label, opts.model_name)),
+            url(r'^(.+)/autosave/$', self.admin_site.admin_view(self.autosave_view),
+                name='%s_%s_autosave' % (opts.app_label, opts.model_name)),
+        )
+        return urls + super(Dashboard, self).get_urls()
+
+    def status_view(self, request):
+        """
+        Returns the status and due time of the accepted tasks in the comma separated ids parameter, or of the
+        unfinished tasks of the user without it, for countdown.js. See sidrun.live_status.
+        """
+        ids = [int(id) for id in request.GET.get('ids', '').split(',') if id.isdigit()]
+        queryset = self.get_queryset(request)
+        if ids:
+            queryset = queryset.filter(pk__in=ids[:live_status.MAX_IDS])
+        else:
+            queryset = queryset.filter(user=request.user, status=InternTask.UNFINISHED)
+        return live_status.status_response(request, queryset)
+
+    def live_status_url(self):
+        return reverse('admin:sidrun_interntask_status', current_app=self.admin_site.name)
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = dict(extra_context or {}, live_status_url=self.live_status_url())
+        return super(Dashboard, self).changelist_view(request, extra_context=extra_context)
+
+    def autosave_view(self, request, object_id):
+        """
+        Stores the submission fields posted by the change form of an unfinished task without rendering the page.
+        The posted version has to match the stored one, otherwise a newer save would be overwritten.
+        """
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        changes = dict((field, request.POST[field]) for field in self.autosave_fields if field in request.POST)
+        try:
+            version = int(request.POST.get('version'))
+        except (TypeError, ValueError):
+            return json_response({'error': 'Version is missing.'}, status=400)
+        intern_tasks = InternTask.objects.filter(pk=unquote(object_id), user=request.user)
+        updated = intern_tasks.filter(status=InternTask.UNFINISHED, version=version).not_overtime() \
+            .update(version=F('version') + 1, **changes)
+        if updated:
+            search.reindex(intern_tasks.select_related('task', 'user'), search.intern_task_document)
+            return json_response({'version': version + 1})
+        intern_task = intern_tasks.with_deadline_state().first()
+        if intern_task is None:
+            return json_response({'error': 'Task not found.'}, status=404)
+        if intern_task.status != InternTask.UNFINISHED or intern_task.overtime():
+            return json_response({'error': 'This task can not be changed any more.'}, status=403)
+        return json_response({'error': 'The task was changed elsewhere, please reload the page.',
+                              'version': intern_task.version}, status=409)
+
+    def get_actions(self, request):
+        if not user_is_admin(request.user):
+            return {}
+        actions = super(Dashboard, self).get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def save_model(self, request, obj, form, change):
+        obj.version += 1
+        # the status and the times are changed by change_status and expire, the loaded ones may already be stale
+        obj.save(update_fields=self.autosave_fields + ('version', 'search_document'))
+
     def has_delete_permission(self, request, obj=None):
         return False
 
@@ -309,21 +505,35 @@ class Dashboard(admin.ModelAdmin):
         return list_display
 
     def time_left_or_ended(self, obj):
-        if obj.status == InternTask.UNFINISHED:
-            if not overtime(obj):
-                s = calculate_time_left(obj)
-                hours, remainder = divmod(s, 3600)
-                minutes, seconds = divmod(remainder, 60)
-                return '<div id="countdown"></div>%d:%d:%d' % (int(hours), int(minutes), int(seconds))
-            else:
-                return "Overtime!"
+        if obj.status == InternTask.UNFINISHED and not obj.overtime():
+            s = obj.get_seconds_left()
+            hours, remainder = divmod(s, 3600)
+            minutes, seconds = divmod(remainder, 60)
+            text = '%d:%d:%d' % (int(hours), int(minutes), int(seconds))
+        elif obj.status in (InternTask.UNFINISHED, InternTask.OVERTIME):
+            text = "Overtime!"
         else:
-            return obj.time_ended
+            text = display_for_value(obj.time_ended)
+        # countdown.js keeps the text up to date from the due time
+        return format_html('<span class="countdown" data-id="{0}" data-status="{1}" data-due="{2}">{3}</span>',
+                           obj.pk, obj.status, live_status.epoch_milliseconds(obj.due_at), text)
 
     time_left_or_ended.allow_tags = True
+    time_left_or_ended.admin_order_field = 'seconds_left'
+
+    def status_label(self, obj):
+        return format_html('<span class="task-status" data-id="{0}">{1}</span>', obj.pk, obj.get_status_display())
+
+    status_label.allow_tags = True
+    status_label.admin_order_field = 'status'
+    status_label.short_description = 'Status'
+
+    def get_changelist(self, request, **kwargs):
+        return DeferringChangeList
 
     def get_queryset(self, request):
-        queryset = super(Dashboard, self).get_queryset(request)
+        queryset = super(Dashboard, self).get_queryset(request).select_related('task__type', 'user')\
+            .with_deadline_state()
         is_admin = user_is_admin(request.user)
         if is_admin:
             return queryset
@@ -351,7 +561,7 @@ class Dashboard(admin.ModelAdmin):
         fields_ = fieldsets[0][1]['fields']
         fields_ = [item for item in fields_ if
                    item not in ['summary_pitch', 'body', 'conclusion', 'references', 'videos']]
-        if obj.status == models.InternTask.UNFINISHED and request.user.groups.filter(name='admins').exists():
+        if obj.status == models.InternTask.UNFINISHED and user_is_admin(request.user):
             fieldsets[0][1].update({'fields': fields_})
         elif show_interntask_as_readonly(obj=obj, request=request):
             fieldsets[0][1].update({'fields': fields_})
@@ -360,10 +570,11 @@ class Dashboard(admin.ModelAdmin):
         return fieldsets
 
     def change_view(self, request, object_id, form_url='', extra_context=None):
-        intern_task = InternTask.objects.get(id=object_id)
-        if intern_task.status == models.InternTask.UNFINISHED\
-                and not overtime(object_id)\
-                and request.user == intern_task.user:
+        intern_task = self.get_object(request, unquote(object_id))
+        if intern_task is not None\
+                and intern_task.status == models.InternTask.UNFINISHED\
+                and not intern_task.overtime()\
+                and request.user.pk == intern_task.user_id:
             is_preview = bool(request.GET.get('preview'))
             extra_context = {
                 'show_save_and_continue': not is_preview,
@@ -371,7 +582,11 @@ class Dashboard(admin.ModelAdmin):
                 'show_accept': False,
                 'show_preview': not is_preview,
                 'show_submit': is_preview,
-                'show_back': is_preview
+                'show_back': is_preview,
+                'autosave_url': None if is_preview else reverse('admin:sidrun_interntask_autosave',
+                                                                args=(intern_task.pk,),
+                                                                current_app=self.admin_site.name),
+                'autosave_version': intern_task.version
             }
         else:
             extra_context = {
@@ -382,6 +597,7 @@ class Dashboard(admin.ModelAdmin):
                 'show_submit': False,
                 'show_back': False
             }
+        extra_context['live_status_url'] = self.live_status_url()
 
         return super(Dashboard, self).change_view(request, object_id,
                                                   form_url, extra_context=extra_context)
@@ -389,13 +605,13 @@ class Dashboard(admin.ModelAdmin):
     def response_change(self, request, obj):
         opts = self.model._meta
         preserved_filters = self.get_preserved_filters(request)
-        if not overtime(obj.id):
+        if not obj.overtime():
             if '_abandon' in request.POST:
-                obj.status = models.InternTask.ABANDONED
-                obj.time_ended = timezone.now()
-                obj.save()
                 msg_dict = {'name': force_text(opts.verbose_name), 'obj': force_text(obj.task.title)}
-                msg = _('The %(name)s %(obj)s was abandoned!') % msg_dict
+                if obj.change_status(models.InternTask.ABANDONED):
+                    msg = _('The %(name)s %(obj)s was abandoned!') % msg_dict
+                else:
+                    msg = _('The %(name)s %(obj)s was not abandoned, its status was changed elsewhere.') % msg_dict
                 self.message_user(request, msg, messages.WARNING, extra_tags='safe')
                 return self.response_post_save_change(request, obj)
             elif '_preview' in request.POST:
@@ -403,12 +619,13 @@ class Dashboard(admin.ModelAdmin):
                 redirect_url = add_preserved_filters({'preserved_filters': preserved_filters, 'opts': opts}, redirect_url)
                 return HttpResponseRedirect(redirect_url)
             elif '_submit' in request.POST:
-                obj.status = models.InternTask.FINISHED
-                obj.time_ended = timezone.now()
-                obj.save()
                 msg_dict = {'name': force_text(opts.verbose_name), 'obj': force_text(obj.task.title)}
-                msg = _('You submitted the %(name)s %(obj)s!') % msg_dict
-                self.message_user(request, msg, messages.SUCCESS, extra_tags='safe')
+                if obj.change_status(models.InternTask.FINISHED):
+                    msg = _('You submitted the %(name)s %(obj)s!') % msg_dict
+                    self.message_user(request, msg, messages.SUCCESS, extra_tags='safe')
+                else:
+                    msg = _('The %(name)s %(obj)s was not submitted, its status was changed elsewhere.') % msg_dict
+                    self.message_user(request, msg, messages.WARNING, extra_tags='safe')
                 return self.response_post_save_change(request, obj)
             else:
                 return super(Dashboard, self).response_change(request, obj)
@@ -424,8 +641,16 @@ class TypeAdmin(admin.ModelAdmin):
     list_display = ('name',)
 
 
+# log entries made by members of a group, checked per entry so that the entries can be read in the order of
+# sidrun_log_newest_first_user instead of being sorted
+_LOGGED_BY_GROUP_SQL = 'EXISTS (SELECT 1 FROM auth_user_groups ' \
+                       'INNER JOIN auth_group ON auth_group.id = auth_user_groups.group_id ' \
+                       'WHERE auth_user_groups.user_id = django_admin_log.user_id AND auth_group.name = %s)'
+
+
 class LogAdmin(admin.ModelAdmin):
     list_display = ('action_time', 'user', 'content_type', 'object', 'change_message')
+    paginator = EstimatedCountPaginator
     list_display_links = ('action_time', )
     fields = ['action_time', 'user', 'content_type', 'object', 'change_message']
     readonly_fields = ('action_time', 'user', 'content_type', 'object', 'change_message',)
@@ -441,20 +666,14 @@ class LogAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         queryset = super(LogAdmin, self).get_queryset(request)
-        interns_group_id = Group.objects.get(name='interns').id
-        intern_user_ids = User.objects.filter(groups__name='interns')
         # # show only log entries that interns have made
-        # if request.user.groups.filter(name='admins').exists():
+        # if user_is_admin(request.user):
         #     return queryset
         # else:
-        return queryset.filter(user_id__in=intern_user_ids)
-
-    def user(self, obj):
-        return User.objects.get(id=obj.user_id)
-
-    def content_type(self, obj):
-        return ContentType.objects.get(id=obj.content_type_id)
+        return queryset.extra(where=[_LOGGED_BY_GROUP_SQL], params=[roles.INTERNS]) \
+            .select_related('user', 'content_type')
 
+    @timed('LogAdmin.object')
     def object(self, obj):
         label = obj.object_repr
         object_url = reverse('admin:%s_%s_change' %
@@ -473,11 +692,14 @@ class HelpTextForAdmin(HelpTextAdmin):
     formfield_overrides = {TextField: {'widget': SummernoteWidget()}, CharField: {'widget': SummernoteWidget()}}
 
 
-class HelpTextForIntern(HelpTextAdmin):
+class HelpTextForIntern(ConditionalChangeViewMixin, RequestObjectCacheMixin, HelpTextAdmin):
     actions = None
     fields = ['heading_safe', 'content_safe']
     readonly_fields = ('heading_safe', 'content_safe',)
 
+    def change_view_validators(self, request, obj):
+        return (), obj.updated_at
+
     def change_view(self, request, object_id, form_url='', extra_context=None):
         extra_context = {
             'show_save_and_continue': False
@@ -0,0 +1,138 @@
+"""
+Measures the query count, wall time and peak memory of every admin entry point, as an intern and as an admin.
+"""
+import json
+import time
+import tracemalloc
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from sidrun.benchmarks.dataset import PASSWORD, INTERN_USERNAME, ADMIN_USERNAME
+
+
+class Measurement(object):
+    def __init__(self, name, role, url):
+        self.name = name
+        self.role = role
+        self.url = url
+        self.status_code = None
+        self.queries = None
+        self.seconds = None
+        self.peak_memory_kb = None
+        self.error = None
+
+    @property
+    def key(self):
+        return '%s %s' % (self.role, self.name)
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in
+                    ('name', 'role', 'url', 'status_code', 'queries', 'seconds', 'peak_memory_kb', 'error'))
+
+
+def measure(client, measurement, repeat):
+    """
+    Requests the url once to count queries and memory, then repeat times more and keeps the fastest time.
+    """
+    try:
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(measurement.url)
+        measurement.peak_memory_kb = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+        measurement.status_code = response.status_code
+        measurement.queries = len(queries)
+        timings = []
+        for i in range(repeat):
+            start = time.time()
+            client.get(measurement.url)
+            timings.append(time.time() - start)
+        measurement.seconds = round(min(timings or [0]), 4)
+    except Exception as e:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        measurement.error = '%s: %s' % (e.__class__.__name__, e)
+    return measurement
+
+
+def first_object_id(model_admin, user):
+    request = RequestFactory().get('/')
+    request.user = user
+    try:
+        return model_admin.get_queryset(request).values_list('pk', flat=True)[:1].get()
+    except Exception:
+        return None
+
+
+def admin_entry_points(user):
+    """
+    Yields the name and url of the changelist and the change view of the first visible object for every
+    registered model admin.
+    """
+    for model, model_admin in sorted(admin.site._registry.items(), key=lambda item: item[0]._meta.db_table):
+        opts = model._meta
+        name = '%s.%s' % (opts.app_label, opts.object_name)
+        yield name + ' changelist', reverse('admin:%s_%s_changelist' % (opts.app_label, opts.model_name))
+        object_id = first_object_id(model_admin, user)
+        if object_id is not None:
+            yield name + ' change', reverse('admin:%s_%s_change' % (opts.app_label, opts.model_name),
+                                            args=(object_id,))
+
+
+def run_admin_benchmarks(repeat=3):
+    admin.autodiscover()
+    measurements = []
+    for role, username in (('intern', INTERN_USERNAME % 0), ('admin', ADMIN_USERNAME)):
+        client = Client()
+        client.login(username=username, password=PASSWORD)
+        user = User.objects.get(username=username)
+        for name, url in admin_entry_points(user):
+            measurements.append(measure(client, Measurement(name, role, url), repeat))
+    return measurements
+
+
+def find_regressions(measurements, baseline, time_tolerance=0.5, memory_tolerance=0.5):
+    """
+    Compares measurements to a baseline report. Any extra query is a regression, time and memory are allowed to
+    grow by the given fractions.
+    """
+    baseline = dict(('%s %s' % (item['role'], item['name']), item) for item in baseline['measurements'])
+    regressions = []
+    for measurement in measurements:
+        expected = baseline.get(measurement.key)
+        if expected is None or expected['error']:
+            continue
+        if measurement.error:
+            regressions.append('%s failed: %s' % (measurement.key, measurement.error))
+            continue
+        if measurement.queries > expected['queries']:
+            regressions.append('%s: %d queries, baseline %d' % (
+                measurement.key, measurement.queries, expected['queries']))
+        if measurement.seconds > expected['seconds'] * (1 + time_tolerance):
+            regressions.append('%s: %.3fs, baseline %.3fs' % (
+                measurement.key, measurement.seconds, expected['seconds']))
+        if measurement.peak_memory_kb > expected['peak_memory_kb'] * (1 + memory_tolerance):
+            regressions.append('%s: %d kB peak memory, baseline %d kB' % (
+                measurement.key, measurement.peak_memory_kb, expected['peak_memory_kb']))
+    return regressions
+
+
+def write_report(path, measurements, dataset, regressions=()):
+    report = {
+        'dataset': dataset,
+        'database': connection.vendor,
+        'measurements': [measurement.as_dict() for measurement in measurements],
+        'regressions': list(regressions),
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def read_report(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,96 @@
+"""
+Compares the latency of admin requests that open a new database connection with that of requests reusing a kept
+connection.
+
+The test client does not close connections between requests, so the requests go through the WSGI handler, which
+closes or keeps the connection by CONN_MAX_AGE like a server process does. On an in-memory SQLite database the
+connection is never closed and both series measure the same.
+"""
+import io
+import sys
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from sidrun.benchmarks.dataset import PASSWORD, ADMIN_USERNAME
+
+
+def session_cookie(username):
+    client = Client()
+    client.login(username=username, password=PASSWORD)
+    return '; '.join('%s=%s' % (name, morsel.value) for name, morsel in client.cookies.items())
+
+
+def wsgi_environ(path, cookie):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_COOKIE': cookie,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multiprocess': False,
+        'wsgi.multithread': False,
+        'wsgi.run_once': False,
+    }
+
+
+def time_requests(handler, path, cookie, n_requests):
+    """
+    Returns the seconds of each request and the number of connections opened for them.
+    """
+    opened = []
+
+    def count(sender, connection, **kwargs):
+        opened.append(connection.alias)
+    connection_created.connect(count)
+    try:
+        timings = []
+        for i in range(n_requests):
+            start = time.time()
+            response = handler(wsgi_environ(path, cookie), lambda status, headers: None)
+            b''.join(response)
+            # closing the response sends request_finished, which closes the connection unless it is kept
+            response.close()
+            timings.append(time.time() - start)
+    finally:
+        connection_created.disconnect(count)
+    return timings, len(opened)
+
+
+def _percentile(timings, fraction):
+    timings = sorted(timings)
+    return timings[min(int(len(timings) * fraction), len(timings) - 1)]
+
+
+def run_connection_benchmark(n_requests=200, conn_max_age=600, path=None):
+    """
+    Returns (label, CONN_MAX_AGE, connections opened, median seconds, 95th percentile seconds) for requests that
+    close the connection and for requests that keep it.
+    """
+    path = path or reverse('admin:sidrun_admintask_changelist')
+    cookie = session_cookie(ADMIN_USERNAME)
+    handler = WSGIHandler()
+    old_conn_max_age = connection.settings_dict.get('CONN_MAX_AGE', 0)
+    results = []
+    try:
+        for label, max_age in (('new connection', 0), ('kept connection', conn_max_age)):
+            connection.settings_dict['CONN_MAX_AGE'] = max_age
+            connection.close()
+            # one request to load the middleware and fill the caches
+            time_requests(handler, path, cookie, 1)
+            timings, opened = time_requests(handler, path, cookie, n_requests)
+            results.append((label, max_age, opened, _percentile(timings, 0.5), _percentile(timings, 0.95)))
+    finally:
+        connection.settings_dict['CONN_MAX_AGE'] = old_conn_max_age
+    return results
@@ -0,0 +1,177 @@
+"""
+Generates a synthetic data set with the volume of several busy terms, for benchmarking the admin.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.admin.models import LogEntry, CHANGE
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from sidrun import roles
+from sidrun.models import Task, Type, Tag, InternTask, Profile
+from sidrun.search import rebuild_search_index
+
+PASSWORD = 'benchmark'
+INTERN_USERNAME = 'benchmark-intern-%d'
+ADMIN_USERNAME = 'benchmark-admin'
+
+PARAGRAPH = '<p>Lorem ipsum dolor sit amet, <b>consectetur</b> adipiscing elit, sed do eiusmod tempor incididunt ' \
+            'ut labore et dolore magna aliqua. <a href="http://example.com/%d">Ut enim ad minim veniam</a>.</p>'
+STATUS_WEIGHTS = ((InternTask.UNFINISHED, 2), (InternTask.FINISHED, 6), (InternTask.ABANDONED, 1),
+                  (InternTask.OVERTIME, 1))
+
+
+@contextmanager
+def keep_timestamps(model, *field_names):
+    """
+    Lets bulk_create store the given values of auto_now and auto_now_add fields instead of the current time.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_create(model, objs, batch_size):
+    """
+    bulk_create with batches no larger than the database allows.
+    """
+    objs = list(objs)
+    if objs:
+        fields = [field for field in model._meta.local_concrete_fields if not field.primary_key]
+        batch_size = min(batch_size, max(connection.ops.bulk_batch_size(fields, objs), 1))
+        model.objects.bulk_create(objs, batch_size)
+
+
+def html(rng, n_paragraphs):
+    return ''.join(PARAGRAPH % rng.randint(0, 10 ** 6) for i in range(n_paragraphs))
+
+
+def create_users(n_interns, batch_size):
+    password = make_password(PASSWORD)
+    users = [User(username=INTERN_USERNAME % i, password=password, is_staff=True) for i in range(n_interns)]
+    users.append(User(username=ADMIN_USERNAME, password=password, is_staff=True, is_superuser=True))
+    bulk_create(User, users, batch_size)
+    interns = list(User.objects.filter(username__startswith=INTERN_USERNAME.split('%')[0])
+                   .values_list('id', flat=True))
+    admin_id = User.objects.get(username=ADMIN_USERNAME).id
+    bulk_create(Profile, [Profile(user_id=user_id, allowed_number_of_tasks=3)
+                                 for user_id in interns + [admin_id]], batch_size)
+    interns_group = Group.objects.get_or_create(name=roles.INTERNS)[0]
+    admins_group = Group.objects.get_or_create(name=roles.ADMINS)[0]
+    memberships = [User.groups.through(user_id=user_id, group_id=interns_group.id) for user_id in interns]
+    memberships.append(User.groups.through(user_id=admin_id, group_id=admins_group.id))
+    bulk_create(User.groups.through, memberships, batch_size)
+    return interns
+
+
+def create_tasks(rng, n_tasks, now, batch_size):
+    types = list(Type.objects.all()) or [Type.objects.create(name='General')]
+    tags = list(Tag.objects.all()) or [Tag.objects.create(name='General')]
+    tasks = []
+    for i in range(n_tasks):
+        start_date = now - timedelta(days=rng.randint(0, 120))
+        tasks.append(Task(title='Benchmark task %d' % i, type=rng.choice(types), description=html(rng, 5),
+                          requirements=html(rng, 3), submission_type=rng.choice(list(Task.submission_type_dict)),
+                          time_to_complete_task=rng.choice((4, 24, 48, 72)),
+                          start_date=start_date if rng.random() < 0.9 else None,
+                          deadline=start_date + timedelta(days=rng.randint(10, 150)),
+                          number_of_positions=rng.randint(5, 50), expected_results=html(rng, 2),
+                          extra_material=html(rng, 2)))
+    bulk_create(Task, tasks, batch_size)
+    task_hours = dict(Task.objects.filter(title__startswith='Benchmark task ')
+                      .values_list('id', 'time_to_complete_task'))
+    bulk_create(Task.tags.through, [Task.tags.through(task_id=task_id, tag_id=tag.id)
+                                           for task_id in task_hours
+                                           for tag in rng.sample(tags, min(len(tags), rng.randint(1, 3)))],
+                                          batch_size)
+    return task_hours
+
+
+def create_intern_tasks(rng, interns, task_hours, n_intern_tasks, now, batch_size):
+    statuses = [status for status, weight in STATUS_WEIGHTS for i in range(weight)]
+    task_ids = list(task_hours)
+    per_intern = max(1, min(len(task_ids), n_intern_tasks // max(1, len(interns))))
+    intern_tasks = []
+    for user_id in interns:
+        for task_id in rng.sample(task_ids, per_intern):
+            status = rng.choice(statuses)
+            time_started = now - timedelta(hours=rng.randint(0, 24 * 90))
+            due_at = time_started + timedelta(hours=task_hours[task_id])
+            if status == InternTask.UNFINISHED and rng.random() < 0.5:
+                time_started = now - timedelta(minutes=rng.randint(1, 60 * task_hours[task_id] - 1))
+                due_at = time_started + timedelta(hours=task_hours[task_id])
+            time_ended = None if status == InternTask.UNFINISHED else min(due_at, now)
+            intern_tasks.append(InternTask(
+                task_id=task_id, user_id=user_id, status=status, time_started=time_started, due_at=due_at,
+                time_ended=time_ended, summary_pitch=html(rng, 1), body=html(rng, 10), conclusion=html(rng, 1),
+                references=html(rng, 1), videos=html(rng, 1)))
+            if len(intern_tasks) >= n_intern_tasks:
+                break
+        if len(intern_tasks) >= n_intern_tasks:
+            break
+    with keep_timestamps(InternTask, 'time_started'):
+        bulk_create(InternTask, intern_tasks, batch_size)
+
+
+def create_log_entries(rng, interns, n_log_entries, now, batch_size):
+    content_type = ContentType.objects.get_for_model(InternTask)
+    intern_task_ids = list(InternTask.objects.values_list('id', flat=True))
+    if not intern_task_ids:
+        return
+    entries = (LogEntry(user_id=rng.choice(interns), content_type=content_type,
+                        object_id=str(rng.choice(intern_task_ids)), object_repr='Benchmark submission',
+                        action_flag=CHANGE, change_message='Changed body.',
+                        action_time=now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)))
+               for i in range(n_log_entries))
+    with keep_timestamps(LogEntry, 'action_time'):
+        batch = []
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) == batch_size:
+                bulk_create(LogEntry, batch, batch_size)
+                batch = []
+        bulk_create(LogEntry, batch, batch_size)
+
+
+def create_dataset(n_tasks=5000, n_interns=1000, n_intern_tasks=50000, n_log_entries=200000, seed=0,
+                   batch_size=1000):
+    """
+    Fills the database with interns, an admin, tasks with tags, accepted tasks in all statuses and admin log
+    entries. All users have the password PASSWORD. The same seed always generates the same data set.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    interns = create_users(n_interns, batch_size)
+    task_hours = create_tasks(rng, n_tasks, now, batch_size)
+    create_intern_tasks(rng, interns, task_hours, n_intern_tasks, now, batch_size)
+    create_log_entries(rng, interns, n_log_entries, now, batch_size)
+    Task.objects.rebuild_counters()
+    rebuild_search_index(batch_size)
+
+
+@contextmanager
+def seeded_test_database(**dataset):
+    """
+    Creates a test database with the data set of create_dataset for the duration of the block.
+    """
+    setup_test_environment()
+    old_database_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        create_dataset(**dataset)
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_database_name, verbosity=0)
+        teardown_test_environment()
@@ -0,0 +1,69 @@
+"""
+Query plans of the querysets behind the admin changelists and the hot paths of the services, to check which of
+them use the indexes of sidrun.indexes.
+"""
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory
+
+from sidrun.benchmarks.dataset import INTERN_USERNAME, ADMIN_USERNAME
+from sidrun.models import InternTask, Task
+
+EXPLAIN_SQL = {
+    'postgresql': 'EXPLAIN ANALYZE ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+
+def explain(queryset):
+    """
+    Returns the plan of the queryset as lines of text, executing it on PostgreSQL to include the actual times.
+    """
+    sql, params = queryset.query.sql_with_params()
+    cursor = connection.cursor()
+    cursor.execute(EXPLAIN_SQL[connection.vendor] + sql, params)
+    if connection.vendor == 'sqlite':
+        # id, parent id, unused, detail
+        return [row[-1] for row in cursor.fetchall()]
+    return [row[0] for row in cursor.fetchall()]
+
+
+def changelist_querysets(user):
+    """
+    Yields the name and the queryset of the first page of every registered changelist as the user sees it.
+    """
+    request = RequestFactory().get('/')
+    request.user = user
+    for model, model_admin in sorted(admin.site._registry.items(), key=lambda item: item[0]._meta.db_table):
+        list_display = model_admin.get_list_display(request)
+        ChangeList = model_admin.get_changelist(request)
+        changelist = ChangeList(request, model, list_display,
+                                model_admin.get_list_display_links(request, list_display),
+                                model_admin.get_list_filter(request), model_admin.date_hierarchy,
+                                model_admin.search_fields, model_admin.list_select_related,
+                                model_admin.list_per_page, model_admin.list_max_show_all,
+                                model_admin.list_editable, model_admin)
+        yield '%s.%s changelist' % (model._meta.app_label, model._meta.object_name), changelist.result_list
+
+
+def service_querysets(user):
+    task = Task.objects.filter(interntask__isnull=False).first()
+    yield 'pending tasks of the user', InternTask.objects.filter(user=user, status=InternTask.UNFINISHED) \
+        .not_overtime()
+    yield 'accepted tasks of a task', InternTask.objects.filter(task=task, status=InternTask.UNFINISHED)
+    yield 'tasks open for accepting', Task.objects.open_for_accepting()
+
+
+def admin_query_plans():
+    """
+    Yields the role, the name and the plan of every changelist queryset as an intern and as an admin, and of the
+    queries of the services.
+    """
+    admin.autodiscover()
+    for role, username in (('intern', INTERN_USERNAME % 0), ('admin', ADMIN_USERNAME)):
+        user = User.objects.get(username=username)
+        for name, queryset in changelist_querysets(user):
+            yield role, name, explain(queryset)
+    for name, queryset in service_querysets(User.objects.get(username=INTERN_USERNAME % 0)):
+        yield 'service', name, explain(queryset)
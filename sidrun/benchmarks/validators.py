@@ -0,0 +1,63 @@
+"""
+Micro-benchmark of the submission validators on large HTML bodies.
+"""
+import re
+import time
+
+from django.utils.html import strip_tags
+
+from sidrun import validators
+
+PARAGRAPH = '<p>Some <b>bold</b> text &amp; an entity, <a href="http://example.com/page/%d?q=1">a link</a>.</p>'
+
+
+def make_html(size):
+    paragraphs = []
+    length = 0
+    while length < size:
+        paragraphs.append(PARAGRAPH % len(paragraphs))
+        length += len(paragraphs[-1])
+    return ''.join(paragraphs)
+
+
+def validate_separately(html):
+    """
+    What CustomForm did before: compile the url pattern, strip the tags and find the links in separate passes.
+    """
+    regex = re.compile(validators.URL_REGEX.pattern, re.IGNORECASE)
+    text_length = len(strip_tags(html))
+    links = re.findall(r'href=[\'"]?([^\'" >]+)', html)
+    return text_length, [link for link in links if not regex.search(link)]
+
+
+def validate_cached(html):
+    parsed = validators.parse_html(html)
+    return parsed.text_length, [link for link in parsed.links if not validators.URL_REGEX.search(link)]
+
+
+def validate_once(html):
+    validators.forget_parsed_html()
+    return validate_cached(html)
+
+
+def best_time(function, html, repeat):
+    timings = []
+    for i in range(repeat):
+        start = time.time()
+        function(html)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def run_validator_benchmark(sizes=(10 * 1024, 100 * 1024, 1024 * 1024), repeat=5):
+    """
+    Returns (size in bytes, seconds for separate passes, seconds for one parse, seconds for validating the same
+    HTML again) for each HTML size.
+    """
+    results = []
+    for size in sizes:
+        html = make_html(size)
+        assert validate_separately(html) == validate_once(html)
+        results.append((size, best_time(validate_separately, html, repeat), best_time(validate_once, html, repeat),
+                        best_time(validate_cached, html, repeat)))
+    return results
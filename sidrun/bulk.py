@@ -0,0 +1,211 @@
+"""
+Creating many tasks at once, from an imported file or as copies of existing tasks.
+
+Every task is checked with the same schedule rules as AddTaskForm before anything is written. The tasks are then
+inserted with one bulk_create and their tags with another, in a single transaction, so a catalog is published
+either completely or not at all.
+"""
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from sidrun import fragments, search
+from sidrun.models import Task, Tag, Type
+from sidrun.validators import validate_deadline, validate_schedule
+
+# columns of an imported file, tags are separated by commas
+IMPORT_FIELDS = ('title', 'type', 'tags', 'description', 'requirements', 'submission_type', 'time_to_complete_task',
+                 'deadline', 'number_of_positions', 'expected_results', 'extra_material', 'require_references',
+                 'require_videos')
+# fields that are copied when a task is cloned
+CLONED_FIELDS = ('title', 'type_id', 'description', 'requirements', 'submission_type', 'time_to_complete_task',
+                 'number_of_positions', 'expected_results', 'extra_material', 'require_references', 'require_videos')
+FORMATS = ('csv', 'json')
+TRUE_VALUES = ('1', 'true', 't', 'yes', 'y')
+FALSE_VALUES = ('0', 'false', 'f', 'no', 'n')
+
+
+class TaskImportError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super(TaskImportError, self).__init__('\n'.join(errors))
+
+
+def read_records(text, format):
+    """
+    Returns the tasks in the CSV or JSON text as dicts. JSON has to be a list of objects with the IMPORT_FIELDS
+    as keys, CSV a header line with the IMPORT_FIELDS and a line per task.
+    """
+    if format == 'csv':
+        return list(csv.DictReader(io.StringIO(text)))
+    try:
+        records = json.loads(text)
+    except ValueError as e:
+        raise TaskImportError(['The file is not valid JSON: %s' % e])
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise TaskImportError(['The file has to contain a list of tasks.'])
+    return records
+
+
+def _to_boolean(value):
+    if isinstance(value, bool):
+        return value
+    value = ('%s' % value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValidationError("'%s' is not yes or no." % value)
+
+
+def _to_names(value):
+    if isinstance(value, (list, tuple)):
+        names = value
+    else:
+        names = (value or '').split(',')
+    return [name.strip() for name in names if name and name.strip()]
+
+
+def build_task(record, types, tags, now):
+    """
+    Returns an unsaved task and the ids of its tags from an imported record. types and tags map names to objects.
+    Raises ValidationError with all problems of the record.
+    """
+    errors = []
+    values = {}
+    submission_types = dict((label.lower(), code) for code, label in Task.SUBMISSION_TYPE)
+    for name in IMPORT_FIELDS:
+        value = record.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        try:
+            if name == 'type':
+                if value not in types:
+                    raise ValidationError("Unknown type '%s'." % value)
+                values['type'] = types[value]
+            elif name == 'tags':
+                unknown = [tag for tag in _to_names(value) if tag not in tags]
+                if unknown:
+                    raise ValidationError('Unknown tag(s) %s.' % ', '.join(unknown))
+                values['tags'] = [tags[tag].pk for tag in _to_names(value)]
+            elif name in ('require_references', 'require_videos'):
+                values[name] = True if value in (None, '') else _to_boolean(value)
+            else:
+                if name == 'submission_type' and value:
+                    value = submission_types.get(value.lower(), value)
+                value = Task._meta.get_field(name).clean(value, None)
+                if name == 'deadline' and timezone.is_naive(value):
+                    value = timezone.make_aware(value, timezone.get_current_timezone())
+                values[name] = value
+        except ValidationError as e:
+            errors.extend('%s: %s' % (name, message) for message in e.messages)
+    if not errors:
+        try:
+            validate_deadline(values['deadline'], now)
+            validate_schedule(values['deadline'], values['time_to_complete_task'], now)
+        except ValidationError as e:
+            errors.extend(e.messages)
+    if errors:
+        raise ValidationError(errors)
+    tag_ids = values.pop('tags')
+    return Task(**values), tag_ids
+
+
+def reserve_task_ids(n):
+    """
+    Returns n unused task ids on PostgreSQL, so tasks inserted with bulk_create can be linked to their tags.
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT nextval(pg_get_serial_sequence('sidrun_task', 'id')) FROM generate_series(1, %s)", [n])
+    return sorted(row[0] for row in cursor.fetchall())
+
+
+def inserted_task_ids(n):
+    """
+    Returns the ids of the last n tasks inserted by bulk_create on SQLite. The insert holds the write lock of the
+    database until the transaction ends, and SQLite gives rows the ids following the largest one.
+    """
+    cursor = connection.cursor()
+    cursor.execute('SELECT MAX(id) FROM sidrun_task')
+    end = cursor.fetchone()[0] + 1
+    return list(range(end - n, end))
+
+
+def create_tasks(tasks_and_tag_ids, publish=False, now=None):
+    """
+    Inserts the tasks with their tags in one transaction and returns them. Published tasks all get the same
+    start date.
+    """
+    now = now or timezone.now()
+    if not tasks_and_tag_ids:
+        return []
+    tag_names = dict(Tag.objects.values_list('pk', 'name'))
+    Tags = Task.tags.through
+    tasks = []
+    for task, tag_ids in tasks_and_tag_ids:
+        task.start_date = now if publish else None
+        # bulk_create does not send pre_save and post_save
+        task.search_document = search.task_document(task, [tag_names[tag_id] for tag_id in tag_ids])
+        tasks.append(task)
+    with transaction.atomic():
+        # bulk_create does not return the ids the tasks need to be linked to their tags
+        if connection.vendor == 'postgresql':
+            for task, pk in zip(tasks, reserve_task_ids(len(tasks))):
+                task.pk = pk
+            Task.objects.bulk_create(tasks)
+        else:
+            Task.objects.bulk_create(tasks)
+            for task, pk in zip(tasks, inserted_task_ids(len(tasks))):
+                task.pk = pk
+        Tags.objects.bulk_create([Tags(task_id=task.pk, tag_id=tag_id)
+                                  for task, (_, tag_ids) in zip(tasks, tasks_and_tag_ids) for tag_id in tag_ids])
+        for task in tasks:
+            search.index_document(Task, task.pk, task.search_document)
+    for task in tasks:
+        fragments.prime_fragments(Task, task)
+    return tasks
+
+
+def import_tasks(records, publish=False, now=None):
+    """
+    Creates the tasks of the imported records. Nothing is created if any record is invalid; the problems of all
+    records are raised together as a TaskImportError.
+    """
+    now = now or timezone.now()
+    types = dict((type.name, type) for type in Type.objects.all())
+    tags = dict((tag.name, tag) for tag in Tag.objects.all())
+    errors = []
+    tasks_and_tag_ids = []
+    for number, record in enumerate(records, 1):
+        try:
+            tasks_and_tag_ids.append(build_task(record, types, tags, now))
+        except ValidationError as e:
+            errors.extend('Task %d: %s' % (number, message) for message in e.messages)
+    if errors:
+        raise TaskImportError(errors)
+    return create_tasks(tasks_and_tag_ids, publish, now)
+
+
+def clone_tasks(queryset, deadline, publish=False, now=None):
+    """
+    Creates a copy of every task of the queryset with the new deadline and without accepted tasks.
+    """
+    now = now or timezone.now()
+    errors = []
+    tasks_and_tag_ids = []
+    for task in queryset.prefetch_related('tags'):
+        try:
+            validate_deadline(deadline, now)
+            validate_schedule(deadline, task.time_to_complete_task, now)
+        except ValidationError as e:
+            errors.extend('%s: %s' % (search.strip_html(task.title), message) for message in e.messages)
+            continue
+        clone = Task(deadline=deadline, **dict((field, getattr(task, field)) for field in CLONED_FIELDS))
+        tasks_and_tag_ids.append((clone, [tag.pk for tag in task.tags.all()]))
+    if errors:
+        raise TaskImportError(errors)
+    return create_tasks(tasks_and_tag_ids, publish, now)
@@ -0,0 +1,80 @@
+"""
+Conditional GET for the read-only change views of published tasks and help texts.
+
+The pages only change when the object is saved, which sets its updated_at, so a browser that sends back the ETag
+or Last-Modified of the page it has gets 304 Not Modified without the page being rendered. The ETag also covers
+the user, the roles and the CSRF token in the page, so a page is never reused for another user or session.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.contrib.admin.util import unquote
+from django.http import HttpResponseNotModified
+from django.utils.encoding import force_bytes
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+from sidrun.roles import get_group_names
+
+# Bump this when the change view templates change, so that browsers do not keep showing the old pages.
+PAGE_VERSION = 1
+
+
+def page_etag(request, obj, parts=()):
+    values = [PAGE_VERSION, obj._meta.concrete_model._meta.db_table, obj.pk, obj.updated_at.isoformat(),
+              request.user.pk, ','.join(sorted(get_group_names(request.user))),
+              request.META.get('CSRF_COOKIE', '')]
+    values.extend(parts)
+    return hashlib.md5(force_bytes('|'.join('%s' % value for value in values))).hexdigest()
+
+
+def etag_matches(request, etag):
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return etag in etags or '*' in etags
+
+
+def is_not_modified(request, etag, last_modified):
+    if request.META.get('HTTP_IF_NONE_MATCH'):
+        # the ETag is more specific than the time, so the time is not looked at when it was sent
+        return etag_matches(request, etag)
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = quote_etag(etag)
+    response['Last-Modified'] = http_date(last_modified)
+    # the page contains the user and a CSRF token, so only the browser may keep it, and has to ask first
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class ConditionalChangeViewMixin(object):
+    """
+    Answers a GET of a read-only change view with 304 Not Modified when the browser has the current page.
+    change_view_validators decides which pages are read-only and what else they depend on.
+    """
+    def change_view_validators(self, request, obj):
+        """
+        Returns the extra parts of the ETag of the page and the time it last changed, or None if the page is not
+        read-only and has to be rendered every time.
+        """
+        return None
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        validators = None
+        # pages with messages show them once
+        if request.method in ('GET', 'HEAD') and not len(messages.get_messages(request)):
+            obj = self.get_object(request, unquote(object_id))
+            if obj is not None:
+                validators = self.change_view_validators(request, obj)
+        if validators is None:
+            return super(ConditionalChangeViewMixin, self).change_view(request, object_id, form_url, extra_context)
+        parts, changed_at = validators
+        etag = page_etag(request, obj, parts)
+        last_modified = changed_at.timestamp()
+        if is_not_modified(request, etag, last_modified):
+            return set_validators(HttpResponseNotModified(), etag, last_modified)
+        response = super(ConditionalChangeViewMixin, self).change_view(request, object_id, form_url, extra_context)
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.db import connections
+
+
+def check_kept_connections(**kwargs):
+    """
+    Closes the connections kept from earlier requests that the database has dropped, so that the request opens a
+    new connection instead of failing on its first query.
+    """
+    if not getattr(settings, 'SIDRUN_DB_HEALTH_CHECKS', False):
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.in_atomic_block and not connection.is_usable():
+            connection.close()
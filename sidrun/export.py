@@ -0,0 +1,125 @@
+"""
+Streaming export of accepted tasks and task statistics as CSV or JSON Lines.
+
+Rows are read in chunks ordered by primary key, each chunk starting after the last key of the previous one, so an
+export keeps a constant number of rows in memory however large the queryset is, and the first lines can be sent
+before the last rows are read.
+"""
+import csv
+import json
+from collections import OrderedDict
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from sidrun.search import strip_html
+
+CHUNK_SIZE = 500
+SUBMISSION_FIELDS = ('summary_pitch', 'body', 'conclusion', 'references', 'videos')
+
+
+def iterate_in_chunks(queryset, chunk_size=CHUNK_SIZE):
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        for obj in chunk:
+            yield obj
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1].pk
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def submission_rows(queryset, raw_html=False, chunk_size=CHUNK_SIZE):
+    """
+    Yields a row per accepted task of the queryset with the task, the intern, the status, the time it took and
+    the submission, with the HTML of the submission stripped unless raw_html is set.
+    """
+    # the queryset of a change list may leave out the submission
+    queryset = queryset.defer(None).select_related('task__type', 'user')
+    statuses = dict(queryset.model.STATUSES)
+    for intern_task in iterate_in_chunks(queryset, chunk_size):
+        task = intern_task.task
+        duration = None
+        if intern_task.time_started and intern_task.time_ended:
+            duration = int((intern_task.time_ended - intern_task.time_started).total_seconds())
+        row = OrderedDict([
+            ('id', intern_task.pk),
+            ('task_id', task.pk),
+            ('task', strip_html(task.title)),
+            ('type', task.type.name),
+            ('user', intern_task.user.get_username()),
+            ('status', statuses.get(intern_task.status, intern_task.status)),
+            ('time_started', _isoformat(intern_task.time_started)),
+            ('due_at', _isoformat(intern_task.due_at)),
+            ('time_ended', _isoformat(intern_task.time_ended)),
+            ('duration_seconds', duration),
+        ])
+        for field in SUBMISSION_FIELDS:
+            value = getattr(intern_task, field) or ''
+            row[field] = value if raw_html else strip_html(value)
+        yield row
+
+
+def task_statistics_rows(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yields a row per task of the queryset with its schedule and the number of accepted tasks in each status.
+    """
+    for task in iterate_in_chunks(queryset.select_related('type'), chunk_size):
+        yield OrderedDict([
+            ('id', task.pk),
+            ('title', strip_html(task.title)),
+            ('type', task.type.name),
+            ('start_date', _isoformat(task.start_date)),
+            ('deadline', _isoformat(task.deadline)),
+            ('hours_to_complete', task.time_to_complete_task),
+            ('positions', task.number_of_positions),
+            ('available_positions', task.available_positions()),
+            ('unfinished', task.active_count),
+            ('finished', task.finished_count),
+            ('abandoned', task.abandoned_count),
+            ('overtime', task.overtime_count),
+        ])
+
+
+class _Line(object):
+    """
+    File-like object whose write returns what is written, so csv.writer can produce one line at a time.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Line())
+    header_written = False
+    for row in rows:
+        if not header_written:
+            yield writer.writerow(list(row.keys()))
+            header_written = True
+        yield writer.writerow(['' if value is None else value for value in row.values()])
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+# format: (line generator, content type, file extension)
+FORMATS = OrderedDict([
+    ('csv', (csv_lines, 'text/csv; charset=utf-8', 'csv')),
+    ('jsonl', (jsonl_lines, 'application/x-ndjson; charset=utf-8', 'jsonl')),
+])
+
+
+def streaming_response(rows, format, name):
+    lines, content_type, extension = FORMATS[format]
+    response = StreamingHttpResponse(lines(rows), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="%s-%s.%s"' % (
+        name, timezone.now().strftime('%Y%m%d-%H%M'), extension)
+    return response
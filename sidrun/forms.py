@@ -1,12 +1,11 @@
-import re
-
 from django.utils import timezone
-from django.core.exceptions import ValidationError
-from django.utils.encoding import force_text
-from django.utils.html import strip_tags
 
 from django import forms
+from django.contrib.admin.widgets import AdminSplitDateTime
+from sidrun.bulk import FORMATS
+from sidrun.instrumentation import timed
 from sidrun.models import Tag
+from sidrun.validators import validate_text_field, validate_urls, validate_deadline, validate_schedule
 
 
 class CustomSelectMultipleTags(forms.ModelMultipleChoiceField):
@@ -26,98 +25,75 @@ class AddTaskForm(forms.ModelForm):
         deadline = data.get('deadline')
         time_to_complete_task = data.get('time_to_complete_task')
         try:
-            hours_between_dates = (deadline - timezone.now()).total_seconds() / 3600
+            validate_schedule(deadline, time_to_complete_task)
         except TypeError:
-            return data
-        if time_to_complete_task > hours_between_dates:
-            raise ValidationError("Hours to complete task has to fit between now and deadline!")
+            pass
         return data
 
     def clean_deadline(self):
         deadline = self.cleaned_data.get("deadline")
-        if deadline and deadline < timezone.now():
-            raise ValidationError("Please enter a deadline that is not in the past!")
+        validate_deadline(deadline)
         return deadline
 
     def save(self, commit=True):
         instance = super(AddTaskForm, self).save(commit=False)
-        if '_publish' in self.request.POST:
+        if self.request is not None and '_publish' in self.request.POST:
             instance.start_date = timezone.now()
         if commit:
             instance.save()
         return instance
 
 
+class ImportTasksForm(forms.Form):
+    file = forms.FileField(help_text='CSV with a header line, or JSON with a list of tasks.')
+    format = forms.ChoiceField(choices=[(format, format.upper()) for format in FORMATS])
+    publish = forms.BooleanField(required=False, help_text='Publish all imported tasks right away.')
+
+
+class CloneTasksForm(forms.Form):
+    deadline = forms.SplitDateTimeField(widget=AdminSplitDateTime)
+    publish = forms.BooleanField(required=False, help_text='Publish the copies right away.')
+
+
 class CustomForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.request = kwargs.pop('request', None)
         super(CustomForm, self).__init__(*args, **kwargs)
-        self.regex = re.compile(
-            r'^(?:http|ftp)s?://'  # http:// or https://
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
-            r'localhost|'  # localhost...
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}|'  # ...or ipv4
-            r'\[?[A-F0-9]*:[A-F0-9:]+\]?)'  # ...or ipv6
-            r'(?::\d+)?'  # optional port
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
 
     def need_to_validate(self):
         return '_preview' in self.request.POST
 
+    @timed('CustomForm.clean_body')
     def clean_body(self):
         body = self.data.get("body") or ''
         if self.need_to_validate():
-            min_body_length = 280
-            body_length = len(strip_tags(body))
-            if body_length < min_body_length:
-                raise ValidationError(
-                    "Body length needs to be at least %d characters. You have %d." % (min_body_length, body_length))
+            validate_text_field('body', body)
         return body
 
+    @timed('CustomForm.clean_summary_pitch')
     def clean_summary_pitch(self):
         summary_pitch = self.data.get("summary_pitch") or ''
         if self.need_to_validate():
-            min_summary_length = 140
-            summary_length = len(strip_tags(summary_pitch))
-            if summary_length < min_summary_length:
-                raise ValidationError("Summary pitch length needs to be at least %d characters. You have %d." % (
-                    min_summary_length, summary_length))
+            validate_text_field('summary_pitch', summary_pitch)
         return summary_pitch
 
+    @timed('CustomForm.clean_conclusion')
     def clean_conclusion(self):
         conclusion = self.data.get("conclusion") or ''
         if self.need_to_validate():
-            min_conclusion_length = 140
-            conclusion_length = len(strip_tags(conclusion))
-            if conclusion_length < min_conclusion_length:
-                raise ValidationError("Conclusion length needs to be at least %d characters. You have %d." % (
-                    min_conclusion_length, conclusion_length))
+            validate_text_field('conclusion', conclusion)
         return conclusion
 
+    @timed('CustomForm.clean_references')
     def clean_references(self):
         references = self.data.get("references")
         if self.need_to_validate() and self.instance.task.require_references:
-            references_prepared_for_validation = re.findall(r'href=[\'"]?([^\'" >]+)', references)
-            if not references_prepared_for_validation:
-                raise ValidationError("There needs to be at least one url address in references. Please use the link icon to add one!")
-            validation_errors = []
-            for reference in references_prepared_for_validation:
-                if not self.regex.search(force_text(reference)):
-                    validation_errors.append(ValidationError("'%s' is not valid url address." % reference))
-            if validation_errors:
-                raise ValidationError(validation_errors)
+            validate_urls(references, "references")
         return references
 
+    @timed('CustomForm.clean_videos')
     def clean_videos(self):
         videos = self.data.get("videos")
         if self.need_to_validate() and self.instance.task.require_videos:
-            video_urls_prepared_for_validation = re.findall(r'href=[\'"]?([^\'" >]+)', videos)
-            if not video_urls_prepared_for_validation:
-                raise ValidationError("There needs to be at least one url address in videos. Please use the link icon to add one!")
-            validation_errors = []
-            for video in video_urls_prepared_for_validation:
-                if not self.regex.search(force_text(video)):
-                    validation_errors.append(ValidationError("'%s' is not a valid url address." % video))
-            if validation_errors:
-                raise ValidationError(validation_errors)
-        return videos
\ No newline at end of file
+            validate_urls(videos, "videos")
+        return videos
@@ -0,0 +1,202 @@
+"""
+Cache of the sanitized HTML of task and help text fields.
+
+The summernote HTML of a published task is read by every intern who opens it but rarely changes, so it is
+sanitized once, when the object is saved, and kept in the cache named by the SIDRUN_FRAGMENT_CACHE setting.
+The cache key contains a hash of the stored HTML, so a changed field is never served from a stale entry.
+"""
+import hashlib
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import get_cache
+from django.utils.encoding import force_text
+from django.utils.safestring import mark_safe
+
+# Bump this when the sanitizer changes, to stop serving fragments it produced before.
+SANITIZER_VERSION = 3
+CACHE_TIMEOUT = getattr(settings, 'SIDRUN_FRAGMENT_CACHE_TIMEOUT', 7 * 24 * 60 * 60)
+
+# Elements summernote produces and the attributes they keep besides GLOBAL_ATTRIBUTES. Other elements are left out
+# but their content is kept.
+ALLOWED_ELEMENTS = dict(
+    [(tag, frozenset()) for tag in ('p', 'br', 'hr', 'div', 'span', 'b', 'strong', 'i', 'em', 'u', 's', 'strike',
+                                    'sub', 'sup', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'code',
+                                    'ul', 'li', 'table', 'thead', 'tbody', 'tfoot', 'tr')],
+    a=frozenset(['href', 'target', 'name']),
+    img=frozenset(['src', 'alt', 'width', 'height']),
+    iframe=frozenset(['src', 'width', 'height', 'frameborder', 'allowfullscreen', 'webkitallowfullscreen',
+                      'mozallowfullscreen']),
+    font=frozenset(['color', 'face', 'size']),
+    ol=frozenset(['start']),
+    td=frozenset(['colspan', 'rowspan']),
+    th=frozenset(['colspan', 'rowspan']),
+)
+GLOBAL_ATTRIBUTES = frozenset(['style', 'class', 'title', 'align', 'dir'])
+# Properties summernote sets in style attributes, the declarations of others are left out.
+STYLE_PROPERTIES = frozenset(['color', 'background-color', 'font-family', 'font-size', 'font-weight', 'font-style',
+                              'text-decoration', 'text-align', 'line-height', 'vertical-align', 'width', 'height',
+                              'float', 'margin', 'margin-left', 'margin-right', 'padding'])
+# Keywords, lengths, colors and font names, with rgb() as the only function so that no URL is loaded.
+STYLE_VALUE_REGEX = re.compile(r'^(?:[#\w\s%.,\'"-]|rgba?\([\d\s.,%]*\))+$')
+# Elements that are dropped together with their content.
+DROPPED_ELEMENTS = frozenset(['script', 'style', 'object', 'applet', 'svg', 'math', 'template'])
+# Schemes a link or an image may have, URLs without one are relative.
+URL_SCHEMES = frozenset(['', 'http', 'https', 'mailto'])
+# Images summernote inserts into the HTML as data: URLs.
+DATA_IMAGE_PREFIXES = ('data:image/png;', 'data:image/jpeg;', 'data:image/gif;')
+# Hosts of the videos summernote embeds, an iframe showing anything else is dropped.
+VIDEO_HOSTS = frozenset(['www.youtube.com', 'youtube.com', 'player.vimeo.com', 'www.dailymotion.com',
+                         'instagram.com', 'vine.co'])
+
+
+_fragment_cache = None
+
+
+def get_fragment_cache():
+    global _fragment_cache
+    if _fragment_cache is None:
+        _fragment_cache = get_cache(getattr(settings, 'SIDRUN_FRAGMENT_CACHE', 'default'))
+    return _fragment_cache
+
+
+def _allowed_style(style):
+    declarations = []
+    for declaration in style.split(';'):
+        name, colon, value = declaration.partition(':')
+        name, value = name.strip().lower(), value.strip()
+        if name in STYLE_PROPERTIES and STYLE_VALUE_REGEX.match(value):
+            declarations.append('%s: %s;' % (name, value))
+    return ' '.join(declarations)
+
+
+def _allowed_url(tag, url):
+    # browsers ignore whitespace and control characters in the scheme
+    url = ''.join(character for character in url if character > ' ').lower()
+    if tag == 'img' and url.startswith(DATA_IMAGE_PREFIXES):
+        return True
+    parts = urlsplit(url)
+    if tag == 'iframe':
+        return parts.scheme in ('', 'http', 'https') and parts.netloc in VIDEO_HOSTS
+    return parts.scheme in URL_SCHEMES
+
+
+class _Sanitizer(HTMLParser):
+    """
+    Copies the elements and attributes of the HTML that summernote produces, with links and images that do not run
+    scripts, iframes of the video sites summernote embeds and the styles it sets. Everything else is left out.
+    """
+    def __init__(self):
+        HTMLParser.__init__(self, convert_charrefs=False)
+        self.parts = []
+        self.dropping = 0
+        # whether each open iframe was kept
+        self.iframes = []
+
+    def start_tag(self, tag, attrs, end):
+        if tag in DROPPED_ELEMENTS:
+            if end == '>':
+                self.dropping += 1
+            return
+        if tag == 'iframe':
+            kept = any(name == 'src' and value and _allowed_url(tag, value) for name, value in attrs)
+            if end == '>':
+                self.iframes.append(kept)
+                if not kept:
+                    self.dropping += 1
+            if not kept:
+                return
+        if self.dropping or tag not in ALLOWED_ELEMENTS:
+            return
+        self.parts.append('<' + tag)
+        for name, value in attrs:
+            if name not in GLOBAL_ATTRIBUTES and name not in ALLOWED_ELEMENTS[tag]:
+                continue
+            if value is None:
+                self.parts.append(' ' + name)
+                continue
+            if name in ('href', 'src') and not _allowed_url(tag, value):
+                continue
+            if name == 'style':
+                value = _allowed_style(value)
+                if not value:
+                    continue
+            self.parts.append(' %s="%s"' % (name, escape(value)))
+        self.parts.append(end)
+
+    def handle_starttag(self, tag, attrs):
+        self.start_tag(tag, attrs, '>')
+
+    def handle_startendtag(self, tag, attrs):
+        self.start_tag(tag, attrs, '/>')
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_ELEMENTS or (tag == 'iframe' and self.iframes and not self.iframes[-1]):
+            self.dropping = max(self.dropping - 1, 0)
+        elif not self.dropping and tag in ALLOWED_ELEMENTS:
+            self.parts.append('</%s>' % tag)
+        if tag == 'iframe' and self.iframes:
+            self.iframes.pop()
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.parts.append(escape(data, quote=False))
+
+    def handle_entityref(self, name):
+        if not self.dropping:
+            self.parts.append('&%s;' % name)
+
+    def handle_charref(self, name):
+        if not self.dropping:
+            self.parts.append('&#%s;' % name)
+
+
+def sanitize(html):
+    parser = _Sanitizer()
+    parser.feed(html)
+    parser.close()
+    return ''.join(parser.parts)
+
+
+def _cache_key(obj, field, html):
+    digest = hashlib.md5(html.encode('utf-8')).hexdigest()
+    model_name = obj._meta.concrete_model._meta.model_name
+    return 'sidrun:fragment:%d:%s:%s:%s:%s' % (SANITIZER_VERSION, model_name, obj.pk, field, digest)
+
+
+def render(obj, field):
+    """
+    Returns the sanitized HTML of the field of the object, from the cache if it has been rendered before.
+    """
+    html = force_text(getattr(obj, field) or '')
+    if not html or obj.pk is None:
+        return mark_safe(sanitize(html))
+    cache = get_fragment_cache()
+    key = _cache_key(obj, field, html)
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = sanitize(html)
+        cache.set(key, fragment, CACHE_TIMEOUT)
+    return mark_safe(fragment)
+
+
+def prime_fragments(sender, instance, **kwargs):
+    """
+    Renders the HTML fields of a saved object, so that the first reader does not pay for it.
+    """
+    cache = get_fragment_cache()
+    fragments = {}
+    for field in sender.fragment_fields:
+        html = force_text(getattr(instance, field) or '')
+        if html:
+            fragments[_cache_key(instance, field, html)] = sanitize(html)
+    cache.set_many(fragments, CACHE_TIMEOUT)
+
+
+def forget_fragments(sender, instance, **kwargs):
+    cache = get_fragment_cache()
+    cache.delete_many([_cache_key(instance, field, force_text(getattr(instance, field) or ''))
+                       for field in sender.fragment_fields])
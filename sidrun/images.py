@@ -0,0 +1,136 @@
+"""
+Small, fixed size copies of the type icons.
+
+The uploaded icon is scaled onto a transparent square of ICON_SIZE pixels, and of twice that for high density
+screens, and saved as an optimized PNG and, when Pillow was built with WebP support, as WebP. The names of the
+copies contain a hash of the uploaded file, so a changed icon gets new names and the copies can be cached by
+browsers forever. The copies are made when a type is saved with a new icon; an icon that can not be read or
+decoded is logged and shown as it was uploaded.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.utils.html import format_html
+from PIL import Image
+
+logger = logging.getLogger('sidrun.images')
+
+ICON_SIZE = 32
+SCALES = (1, 2)
+DERIVED_DIR = 'type_icons/derived'
+# Bump this when the copies are made differently, to give them new names.
+PIPELINE_VERSION = 1
+WEBP_QUALITY = 80
+CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def webp_supported():
+    Image.init()
+    return 'WEBP' in Image.SAVE
+
+
+def icon_hash(content):
+    return hashlib.sha1(('%d:' % PIPELINE_VERSION).encode() + content).hexdigest()[:16]
+
+
+def derived_name(hash, scale, extension):
+    return posixpath.join(DERIVED_DIR, '%s-%d.%s' % (hash, ICON_SIZE * scale, extension))
+
+
+def _fit(image, size):
+    image = image.convert('RGBA')
+    image.thumbnail((size, size), Image.ANTIALIAS)
+    canvas = Image.new('RGBA', (size, size), (255, 255, 255, 0))
+    canvas.paste(image, ((size - image.size[0]) // 2, (size - image.size[1]) // 2), image)
+    return canvas
+
+
+def _encode(image, format):
+    buffer = io.BytesIO()
+    if format == 'WEBP':
+        image.save(buffer, format, quality=WEBP_QUALITY, method=6)
+    else:
+        image.save(buffer, format, optimize=True)
+    return buffer.getvalue()
+
+
+def make_icon_derivatives(content, storage):
+    """
+    Saves the copies of the icon with the given bytes in the storage unless they exist. Returns the hash in their
+    names and whether WebP copies were made.
+    """
+    hash = icon_hash(content)
+    formats = [('PNG', 'png')]
+    has_webp = webp_supported()
+    if has_webp:
+        formats.append(('WEBP', 'webp'))
+    original = Image.open(io.BytesIO(content))
+    for scale in SCALES:
+        image = _fit(original, ICON_SIZE * scale)
+        for format, extension in formats:
+            name = derived_name(hash, scale, extension)
+            if not storage.exists(name):
+                storage.save(name, ContentFile(_encode(image, format)))
+    return hash, has_webp
+
+
+def update_icon_derivatives(type):
+    """
+    Makes the copies of the icon of the type if it has changed, and stores their hash on the type.
+    """
+    fields = {'icon_hash': '', 'icon_has_webp': False}
+    if type.icon:
+        try:
+            type.icon.open('rb')
+            try:
+                content = type.icon.read()
+            finally:
+                type.icon.close()
+            if type.icon_hash == icon_hash(content):
+                return
+            hash, has_webp = make_icon_derivatives(content, type.icon.storage)
+            fields = {'icon_hash': hash, 'icon_has_webp': has_webp}
+        except (IOError, OSError):
+            # icon_html shows the uploaded file without copies
+            logger.exception('Could not make the copies of the icon %s of type %s', type.icon.name, type.pk)
+    type.__class__._default_manager.filter(pk=type.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(type, name, value)
+
+
+def _icon_name(value):
+    # the model keeps the name it was loaded with until the field is accessed
+    return getattr(value, 'name', value) or ''
+
+
+def remember_icon_name(sender, instance, **kwargs):
+    # a deferred icon is not loaded, and counts as changed
+    instance._saved_icon_name = _icon_name(instance.__dict__.get('icon'))
+
+
+def update_icon_derivatives_after_save(sender, instance, created, raw=False, **kwargs):
+    # loaddata saves raw rows, build_type_icons makes the copies of their icons
+    if not raw and (created or _icon_name(instance.icon) != instance._saved_icon_name):
+        update_icon_derivatives(instance)
+    instance._saved_icon_name = _icon_name(instance.icon)
+
+
+def icon_html(type):
+    """
+    Returns a <picture> of the sized copies of the icon of the type, or an <img> of the uploaded file if there are
+    no copies yet.
+    """
+    if not type.icon_hash:
+        return format_html('<img src="{0}" alt=""/>', type.icon.url) if type.icon else ''
+    storage = type.icon.storage
+
+    def srcset(extension):
+        return ', '.join('%s %dx' % (storage.url(derived_name(type.icon_hash, scale, extension)), scale)
+                         for scale in SCALES)
+
+    source = format_html('<source type="image/webp" srcset="{0}"/>', srcset('webp')) if type.icon_has_webp else ''
+    return format_html('<picture>{0}<img src="{1}" srcset="{2}" width="{3}" height="{3}" alt=""/></picture>',
+                       source, storage.url(derived_name(type.icon_hash, 1, 'png')), srcset('png'), ICON_SIZE)
@@ -0,0 +1,105 @@
+"""
+The index plan for the filters the admin and the services run most: partial and expression indexes, which can not
+be declared on the models, and composite indexes that existing databases need. They are created with CREATE INDEX
+IF NOT EXISTS so they can be applied to existing databases with the create_indexes command as well as on syncdb.
+The full text tables that sidrun.search uses on SQLite are created the same way, when SQLite has the FTS5 module.
+
+The explain_admin_queries command prints the plans of the admin querysets, with and without these indexes.
+"""
+import logging
+
+from django.db import connections
+
+logger = logging.getLogger('sidrun.indexes')
+
+# (name, table, columns or expression, vendors the index is created on)
+INDEXES = (
+    # LogAdmin lists entries made by interns, newest first, and checks the group of the user of each entry
+    ('sidrun_log_newest_first_user', 'django_admin_log', '(action_time DESC, id DESC, user_id)',
+     ('postgresql', 'sqlite')),
+    # Dashboard lists the tasks of an intern and accept_task counts the unfinished ones that are not overtime
+    ('sidrun_interntask_user_status_due_at', 'sidrun_interntask', '(user_id, status, due_at)',
+     ('postgresql', 'sqlite')),
+    # the accepted tasks of a task per status, for the task admin inline and rebuilding the counters
+    ('sidrun_interntask_task_status', 'sidrun_interntask', '(task_id, status)', ('postgresql', 'sqlite')),
+    # ViewNewTasks lists published tasks that can be finished before their deadline, the expression is
+    # _ACCEPTING_UNTIL_SQL of sidrun.models
+    ('sidrun_task_accepting_until', 'sidrun_task',
+     "(((deadline AT TIME ZONE 'UTC') - interval '1 hour' * time_to_complete_task)) WHERE start_date IS NOT NULL",
+     ('postgresql',)),
+    ('sidrun_task_published_start_date', 'sidrun_task', '(start_date) WHERE start_date IS NOT NULL',
+     ('postgresql', 'sqlite')),
+    # full text search, see sidrun.search
+    ('sidrun_task_search', 'sidrun_task', "USING gin (to_tsvector('simple', search_document))", ('postgresql',)),
+    ('sidrun_interntask_search', 'sidrun_interntask', "USING gin (to_tsvector('simple', search_document))",
+     ('postgresql',)),
+)
+
+# indexes that were replaced by ones of INDEXES, dropped by create_indexes
+OBSOLETE_INDEXES = ('sidrun_log_action_time_user',)
+
+# (name, module with its arguments, vendors the table is created on)
+VIRTUAL_TABLES = (
+    ('sidrun_task_fts', 'fts5(search_document)', ('sqlite',)),
+    ('sidrun_interntask_fts', 'fts5(search_document)', ('sqlite',)),
+)
+
+
+# database alias -> whether its SQLite library has the FTS5 module
+_fts5_support = {}
+
+
+def has_fts5(connection):
+    """
+    Tells whether the full text tables can be used on the connection, that is whether it is SQLite compiled with FTS5.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts5_support:
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA compile_options')
+        _fts5_support[connection.alias] = 'ENABLE_FTS5' in [row[0] for row in cursor.fetchall()]
+    return _fts5_support[connection.alias]
+
+
+def create_indexes(using='default', verbosity=1):
+    connection = connections[using]
+    cursor = connection.cursor()
+    created = []
+    for name in OBSOLETE_INDEXES:
+        cursor.execute('DROP INDEX IF EXISTS %s' % name)
+    for name, table, definition, vendors in INDEXES:
+        if connection.vendor in vendors:
+            cursor.execute('CREATE INDEX IF NOT EXISTS %s ON %s %s' % (name, table, definition))
+            created.append(name)
+            if verbosity >= 2:
+                logger.info('Created index %s on %s', name, table)
+    if connection.vendor == 'sqlite' and not has_fts5(connection):
+        # sidrun.search falls back to scanning the search documents
+        logger.warning('SQLite has no FTS5 module, the full text tables are not created')
+        return created
+    for name, module, vendors in VIRTUAL_TABLES:
+        if connection.vendor in vendors:
+            cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS %s USING %s' % (name, module))
+            created.append(name)
+            if verbosity >= 2:
+                logger.info('Created table %s', name)
+    return created
+
+
+def drop_indexes(using='default'):
+    """
+    Drops the indexes of INDEXES, to compare query plans without them.
+    """
+    connection = connections[using]
+    cursor = connection.cursor()
+    dropped = []
+    for name, table, definition, vendors in INDEXES:
+        if connection.vendor in vendors:
+            cursor.execute('DROP INDEX IF EXISTS %s' % name)
+            dropped.append(name)
+    return dropped
+
+
+def create_indexes_after_syncdb(sender, db='default', verbosity=1, **kwargs):
+    create_indexes(using=db, verbosity=verbosity)
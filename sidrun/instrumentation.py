@@ -0,0 +1,197 @@
+"""
+Opt-in timing of requests and of named hot functions.
+
+InstrumentationMiddleware records for a sample of the requests the number and time of the SQL queries, the time
+spent rendering the template response and the total time, together with the time of every function decorated
+with (or block wrapped in) timed. Each sampled request is written as one JSON line to the sidrun.instrumentation
+logger and added to in-process totals, which admins can read from the instrumentation_stats view.
+
+Settings:
+    SIDRUN_INSTRUMENTATION: turns the middleware on. When off the middleware removes itself when it is loaded and
+        timed only looks up a thread local before calling the function.
+    SIDRUN_INSTRUMENTATION_SAMPLE_RATE: the share of requests that are recorded, from 0 to 1.
+    SIDRUN_INSTRUMENTATION_LOG_THRESHOLD: only requests that took at least this many milliseconds are logged.
+"""
+import functools
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('sidrun.instrumentation')
+# view of the requests that did not resolve to one, e.g. 404s, so that their paths do not pile up in the totals
+UNRESOLVED_VIEW = '<unresolved>'
+
+_local = threading.local()
+_lock = threading.Lock()
+_view_totals = {}
+_function_totals = {}
+
+
+def is_enabled():
+    return getattr(settings, 'SIDRUN_INSTRUMENTATION', False)
+
+
+def _milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+class RequestRecord(object):
+    def __init__(self):
+        self.start = time.time()
+        self.view = None
+        self.template_seconds = 0.0
+        # name: [calls, seconds]
+        self.functions = {}
+
+    def add_call(self, name, seconds):
+        totals = self.functions.setdefault(name, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+
+
+class timed(object):
+    """
+    Times a function, as a decorator, or a block, as a context manager, under the given name in the recorded
+    requests.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.record = None
+
+    def __call__(self, function):
+        name = self.name
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            record = getattr(_local, 'record', None)
+            if record is None:
+                return function(*args, **kwargs)
+            start = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record.add_call(name, time.time() - start)
+        return wrapper
+
+    def __enter__(self):
+        self.record = getattr(_local, 'record', None)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.record is not None:
+            self.record.add_call(self.name, time.time() - self.start)
+
+
+def _add_to_totals(totals, key, milliseconds, **counts):
+    entry = totals.get(key)
+    if entry is None:
+        entry = totals[key] = dict(dict((name, 0) for name in counts), count=0, total_ms=0.0, max_ms=0.0)
+    entry['count'] += 1
+    entry['total_ms'] += milliseconds
+    entry['max_ms'] = max(entry['max_ms'], milliseconds)
+    for name, value in counts.items():
+        entry[name] += value
+
+
+def get_stats():
+    """
+    Returns the totals of the requests per view and of the calls per timed name recorded by this process.
+    """
+    with _lock:
+        views = dict((name, dict(entry)) for name, entry in _view_totals.items())
+        functions = dict((name, dict(entry)) for name, entry in _function_totals.items())
+    for entry in list(views.values()) + list(functions.values()):
+        entry['average_ms'] = round(entry['total_ms'] / entry['count'], 3)
+    return {'enabled': is_enabled(), 'sample_rate': getattr(settings, 'SIDRUN_INSTRUMENTATION_SAMPLE_RATE', 1.0),
+            'views': views, 'functions': functions}
+
+
+def reset_stats():
+    with _lock:
+        _view_totals.clear()
+        _function_totals.clear()
+
+
+class InstrumentationMiddleware(object):
+    """
+    Records a sample of the requests. Put it first in MIDDLEWARE_CLASSES so that the total time covers the other
+    middleware.
+    """
+    def __init__(self):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.sample_rate = getattr(settings, 'SIDRUN_INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        self.log_threshold = getattr(settings, 'SIDRUN_INSTRUMENTATION_LOG_THRESHOLD', 0)
+
+    def process_request(self, request):
+        _local.record = None
+        if random.random() >= self.sample_rate:
+            return
+        record = RequestRecord()
+        # the debug cursor keeps the SQL and the time of every query in connection.queries
+        record.connections = []
+        for connection in connections.all():
+            record.connections.append((connection, connection.use_debug_cursor, len(connection.queries)))
+            connection.use_debug_cursor = True
+        request._instrumentation = _local.record = record
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        record = getattr(request, '_instrumentation', None)
+        if record is not None:
+            match = getattr(request, 'resolver_match', None)
+            record.view = (match and match.url_name) or '%s.%s' % (view_func.__module__, view_func.__name__)
+
+    def process_template_response(self, request, response):
+        record = getattr(request, '_instrumentation', None)
+        if record is not None:
+            # rendering starts right after the template response middleware
+            start = time.time()
+
+            def rendered(response):
+                record.template_seconds += time.time() - start
+            response.add_post_render_callback(rendered)
+        return response
+
+    def process_response(self, request, response):
+        record = getattr(request, '_instrumentation', None)
+        if record is None:
+            return response
+        del request._instrumentation
+        _local.record = None
+        total = time.time() - record.start
+        sql_count = 0
+        sql_seconds = 0.0
+        for connection, use_debug_cursor, first_query in record.connections:
+            queries = connection.queries[first_query:]
+            sql_count += len(queries)
+            sql_seconds += sum(float(query['time']) for query in queries)
+            del connection.queries[first_query:]
+            connection.use_debug_cursor = use_debug_cursor
+        view = record.view or UNRESOLVED_VIEW
+        entry = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': _milliseconds(total),
+            'sql_count': sql_count,
+            'sql_ms': _milliseconds(sql_seconds),
+            'template_ms': _milliseconds(record.template_seconds),
+            'functions': dict((name, {'calls': calls, 'ms': _milliseconds(seconds)})
+                              for name, (calls, seconds) in record.functions.items()),
+        }
+        with _lock:
+            _add_to_totals(_view_totals, view, entry['total_ms'], sql_count=sql_count, sql_ms=entry['sql_ms'],
+                           template_ms=entry['template_ms'])
+            for name, (calls, seconds) in record.functions.items():
+                _add_to_totals(_function_totals, name, _milliseconds(seconds), calls=calls)
+        if entry['total_ms'] >= self.log_threshold:
+            logger.info(json.dumps(entry, sort_keys=True))
+        return response
@@ -0,0 +1,50 @@
+"""
+Status of accepted tasks for the countdowns of the dashboard.
+
+countdown.js ticks every countdown from its absolute due time and polls the status view of the dashboard for
+changed statuses. The response is compact JSON with an ETag of its content, so a poll that finds nothing new is
+answered with 304 Not Modified, and it carries the time of the server, so countdowns do not drift with the clock
+of the browser.
+"""
+import hashlib
+import json
+import time
+
+from django.contrib.admin.util import display_for_value
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import quote_etag
+
+from sidrun.conditional import etag_matches
+
+# most ids a poll may ask for, more than a change list page shows
+MAX_IDS = 500
+
+
+def epoch_milliseconds(value):
+    return int(value.timestamp() * 1000) if value else ''
+
+
+def status_data(queryset):
+    """
+    Returns [id, status, due time, end time] of the accepted tasks of the queryset, with the due time in
+    milliseconds since the epoch and the end time as the dashboard shows it, and the labels of the statuses.
+    """
+    rows = queryset.order_by('pk').values_list('pk', 'status', 'due_at', 'time_ended')
+    return {
+        'statuses': dict(queryset.model.STATUSES),
+        'tasks': [[pk, status, epoch_milliseconds(due_at) or None,
+                   display_for_value(time_ended) if time_ended else None] for pk, status, due_at, time_ended in rows],
+    }
+
+
+def status_response(request, queryset):
+    content = json.dumps(status_data(queryset), separators=(',', ':'), sort_keys=True)
+    etag = hashlib.md5(content.encode('utf-8')).hexdigest()
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = quote_etag(etag)
+    response['Cache-Control'] = 'private, no-cache'
+    response['X-Server-Time'] = int(time.time() * 1000)
+    return response
@@ -0,0 +1,79 @@
+import os
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+from sidrun import benchmarks
+from sidrun.benchmarks.dataset import seeded_test_database
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(benchmarks.__file__), 'baseline.json')
+DATASET_OPTIONS = (
+    make_option('--tasks', type='int', default=5000),
+    make_option('--interns', type='int', default=1000),
+    make_option('--intern-tasks', type='int', default=50000),
+    make_option('--log-entries', type='int', default=200000),
+    make_option('--seed', type='int', default=0),
+)
+
+
+def dataset_from_options(options):
+    return dict((name, options[name.replace('-', '_')])
+                for name in ('tasks', 'interns', 'intern-tasks', 'log-entries', 'seed'))
+
+
+def seeded_database(dataset):
+    return seeded_test_database(n_tasks=dataset['tasks'], n_interns=dataset['interns'],
+                                n_intern_tasks=dataset['intern-tasks'], n_log_entries=dataset['log-entries'],
+                                seed=dataset['seed'])
+
+
+class Command(NoArgsCommand):
+    help = 'Seeds a synthetic data set into a test database and measures every admin changelist and change ' \
+           'view as an intern and as an admin. Fails when a view got slower than the baseline, or when there is no ' \
+           'baseline of the same data set.'
+    option_list = NoArgsCommand.option_list + DATASET_OPTIONS + (
+        make_option('--repeat', type='int', default=3, help='Number of timed requests per view.'),
+        make_option('--report', default='admin_benchmark.json', help='Where to write the report.'),
+        make_option('--baseline', default=DEFAULT_BASELINE, help='Report to compare against.'),
+        make_option('--update-baseline', action='store_true', default=False,
+                    help='Store the report as the new baseline instead of comparing against it.'),
+        make_option('--time-tolerance', type='float', default=0.5,
+                    help='Allowed relative growth of wall time before it counts as a regression.'),
+        make_option('--memory-tolerance', type='float', default=0.5,
+                    help='Allowed relative growth of peak memory before it counts as a regression.'),
+    )
+
+    def handle_noargs(self, **options):
+        dataset = dataset_from_options(options)
+        baseline = None
+        if not options['update_baseline']:
+            # the times depend on the machine, so the baseline is measured where it is compared and is not shipped
+            if not os.path.exists(options['baseline']):
+                raise CommandError('There is no baseline in %s to compare against. Run the command with '
+                                   '--update-baseline on this machine first.' % options['baseline'])
+            baseline = benchmarks.read_report(options['baseline'])
+            if baseline['dataset'] != dataset:
+                raise CommandError('The baseline in %s was measured with a different data set: %s.' % (
+                    options['baseline'], ', '.join('%s=%s' % item for item in sorted(baseline['dataset'].items()))))
+        self.stdout.write('Seeding %s' % ', '.join('%s=%s' % item for item in sorted(dataset.items())))
+        with seeded_database(dataset):
+            measurements = benchmarks.run_admin_benchmarks(repeat=options['repeat'])
+
+        for measurement in measurements:
+            if measurement.error:
+                self.stdout.write('%-45s %s' % (measurement.key, measurement.error))
+            else:
+                self.stdout.write('%-45s %3d %4d queries %8.3fs %8d kB' % (
+                    measurement.key, measurement.status_code, measurement.queries, measurement.seconds,
+                    measurement.peak_memory_kb))
+
+        if options['update_baseline']:
+            benchmarks.write_report(options['baseline'], measurements, dataset)
+            self.stdout.write('Stored the baseline in %s' % options['baseline'])
+            return
+        regressions = benchmarks.find_regressions(measurements, baseline, options['time_tolerance'],
+                                                  options['memory_tolerance'])
+        benchmarks.write_report(options['report'], measurements, dataset, regressions)
+        self.stdout.write('Wrote the report to %s' % options['report'])
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
@@ -0,0 +1,25 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from sidrun.benchmarks.connections import run_connection_benchmark
+from sidrun.management.commands.benchmark_admin import DATASET_OPTIONS, dataset_from_options, seeded_database
+
+
+class Command(NoArgsCommand):
+    help = 'Seeds a synthetic data set into a test database and compares the latency of admin requests that open ' \
+           'a new database connection with requests that reuse a kept one.'
+    option_list = NoArgsCommand.option_list + DATASET_OPTIONS + (
+        make_option('--requests', type='int', default=200, help='Number of timed requests per series.'),
+        make_option('--conn-max-age', type='int', default=600, help='CONN_MAX_AGE of the kept connections.'),
+        make_option('--path', default=None, help='Path to request, the task changelist by default.'),
+    )
+
+    def handle_noargs(self, **options):
+        dataset = dataset_from_options(options)
+        self.stdout.write('Seeding %s' % ', '.join('%s=%s' % item for item in sorted(dataset.items())))
+        with seeded_database(dataset):
+            results = run_connection_benchmark(options['requests'], options['conn_max_age'], options['path'])
+        self.stdout.write('%-16s %12s %12s %10s %10s' % ('', 'CONN_MAX_AGE', 'connections', 'median', '95%'))
+        for label, max_age, opened, median, p95 in results:
+            self.stdout.write('%-16s %12d %12d %9.4fs %9.4fs' % (label, max_age, opened, median, p95))
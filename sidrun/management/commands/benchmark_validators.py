@@ -0,0 +1,17 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from sidrun.benchmarks.validators import run_validator_benchmark
+
+
+class Command(NoArgsCommand):
+    help = 'Times the submission validators on large generated HTML bodies.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--repeat', type='int', default=5, help='Number of timed runs per size.'),
+    )
+
+    def handle_noargs(self, **options):
+        self.stdout.write('%10s %14s %14s %14s' % ('size', 'separate', 'one parse', 'again'))
+        for size, separate, once, again in run_validator_benchmark(repeat=options['repeat']):
+            self.stdout.write('%8dkB %13.4fs %13.4fs %13.4fs' % (size // 1024, separate, once, again))
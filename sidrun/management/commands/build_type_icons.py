@@ -0,0 +1,13 @@
+from django.core.management.base import NoArgsCommand
+
+from sidrun.images import update_icon_derivatives
+from sidrun.models import Type
+
+
+class Command(NoArgsCommand):
+    help = 'Makes the sized copies of the icons of all types that do not have them yet.'
+
+    def handle_noargs(self, **options):
+        for type in Type.objects.all():
+            update_icon_derivatives(type)
+            self.stdout.write('%s: %s' % (type.name, type.icon_hash or 'no icon'))
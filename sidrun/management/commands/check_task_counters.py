@@ -0,0 +1,15 @@
+from django.core.management.base import NoArgsCommand, CommandError
+
+from sidrun.models import Task
+
+
+class Command(NoArgsCommand):
+    help = 'Reports tasks whose stored status counters differ from the accepted tasks in the database.'
+
+    def handle_noargs(self, **options):
+        mismatches = Task.objects.counter_mismatches()
+        for task_id, field, stored, actual in mismatches:
+            self.stdout.write('Task %d: %s is %d, should be %d' % (task_id, field, stored, actual))
+        if mismatches:
+            raise CommandError('%d counter(s) out of sync, run rebuild_task_counters to fix them.' % len(mismatches))
+        self.stdout.write('All task counters are consistent.')
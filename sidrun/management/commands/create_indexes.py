@@ -0,0 +1,17 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from sidrun.indexes import create_indexes
+
+
+class Command(NoArgsCommand):
+    help = 'Creates the indexes of sidrun that are not declared on the models, skipping those that exist.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--database', default=DEFAULT_DB_ALIAS, help='Database to create the indexes in.'),
+    )
+
+    def handle_noargs(self, **options):
+        for name in create_indexes(using=options['database'], verbosity=int(options['verbosity'])):
+            self.stdout.write('Index %s is in place.' % name)
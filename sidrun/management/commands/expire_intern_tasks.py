@@ -0,0 +1,35 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.db.models import Count
+
+from sidrun.models import InternTask, Task
+
+
+class Command(NoArgsCommand):
+    help = 'Moves unfinished accepted tasks that are past their due time to the overtime status. ' \
+           'Safe to run repeatedly, e.g. from cron every few minutes.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', type='int', default=500,
+                    help='Number of accepted tasks to expire per transaction.'),
+        make_option('--dry-run', action='store_true', default=False,
+                    help='Only report which tasks would be expired.'),
+    )
+
+    def handle_noargs(self, **options):
+        if options['dry_run']:
+            missing_due_at = InternTask.objects.filter(due_at__isnull=True).count()
+            if missing_due_at:
+                self.stdout.write('Would store the due time of %d accepted task(s).' % missing_due_at)
+            expired = dict(InternTask.objects.filter(status=InternTask.UNFINISHED).overtime()
+                           .values_list('task_id').annotate(n=Count('id')).order_by())
+        else:
+            filled_in = InternTask.objects.fill_in_due_at()
+            if filled_in:
+                self.stdout.write('Stored the due time of %d accepted task(s).' % filled_in)
+            expired = InternTask.objects.expire(batch_size=options['batch_size'])
+        titles = dict(Task.objects.filter(id__in=expired.keys()).values_list('id', 'title'))
+        for task_id, n_expired in sorted(expired.items()):
+            self.stdout.write('%s: %d' % (titles.get(task_id, task_id), n_expired))
+        self.stdout.write('%s %d accepted task(s).' % ('Would expire' if options['dry_run'] else 'Expired',
+                                                      sum(expired.values())))
@@ -0,0 +1,31 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.db import connection
+
+from sidrun.benchmarks.explain import admin_query_plans
+from sidrun.indexes import drop_indexes
+from sidrun.management.commands.benchmark_admin import DATASET_OPTIONS, dataset_from_options, seeded_database
+
+
+class Command(NoArgsCommand):
+    help = 'Seeds a synthetic data set into a test database and prints the query plan of every admin changelist ' \
+           'and of the hot queries of the services. EXPLAIN ANALYZE on PostgreSQL, EXPLAIN QUERY PLAN on SQLite.'
+    option_list = NoArgsCommand.option_list + DATASET_OPTIONS + (
+        make_option('--without-indexes', action='store_true', default=False,
+                    help='Drop the indexes of sidrun.indexes first, to see the plans without them.'),
+    )
+
+    def handle_noargs(self, **options):
+        dataset = dataset_from_options(options)
+        self.stdout.write('Seeding %s' % ', '.join('%s=%s' % item for item in sorted(dataset.items())))
+        with seeded_database(dataset):
+            if options['without_indexes']:
+                for name in drop_indexes():
+                    self.stdout.write('Dropped index %s' % name)
+            # up to date statistics for the planner
+            connection.cursor().execute('ANALYZE')
+            for role, name, plan in admin_query_plans():
+                self.stdout.write('\n%s: %s' % (role, name))
+                for line in plan:
+                    self.stdout.write('    ' + line)
@@ -0,0 +1,49 @@
+import sys
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+from sidrun import export
+from sidrun.models import InternTask, Task
+
+
+class Command(NoArgsCommand):
+    help = 'Writes accepted tasks with their submissions, or the statistics of tasks, as CSV or JSON Lines.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--format', default='csv', choices=list(export.FORMATS), help='csv or jsonl.'),
+        make_option('--output', help='File to write to instead of the standard output.'),
+        make_option('--status', action='append', dest='statuses', choices=[s for s, label in InternTask.STATUSES],
+                    help='Export only accepted tasks in this status. Can be given more than once.'),
+        make_option('--task', action='append', dest='tasks', type='int',
+                    help='Export only this task. Can be given more than once.'),
+        make_option('--raw-html', action='store_true', default=False,
+                    help='Keep the HTML of the submissions instead of stripping it.'),
+        make_option('--statistics', action='store_true', default=False,
+                    help='Export the accepted task counts of tasks instead of submissions.'),
+        make_option('--chunk-size', type='int', default=export.CHUNK_SIZE, help='Number of rows read per query.'),
+    )
+
+    def handle_noargs(self, **options):
+        if options['statistics']:
+            queryset = Task.objects.all()
+            if options['tasks']:
+                queryset = queryset.filter(pk__in=options['tasks'])
+            rows = export.task_statistics_rows(queryset, chunk_size=options['chunk_size'])
+        else:
+            queryset = InternTask.objects.all()
+            if options['statuses']:
+                queryset = queryset.filter(status__in=options['statuses'])
+            if options['tasks']:
+                queryset = queryset.filter(task__in=options['tasks'])
+            rows = export.submission_rows(queryset, raw_html=options['raw_html'], chunk_size=options['chunk_size'])
+        lines = export.FORMATS[options['format']][0](rows)
+        try:
+            output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        except IOError as e:
+            raise CommandError('Can not write to %s: %s' % (options['output'], e))
+        try:
+            for line in lines:
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
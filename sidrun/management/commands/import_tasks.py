@@ -0,0 +1,33 @@
+import os
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sidrun import bulk
+
+
+class Command(BaseCommand):
+    args = '<file>'
+    help = 'Creates the tasks of a CSV or JSON file in one transaction. Nothing is created if any task is invalid.'
+    option_list = BaseCommand.option_list + (
+        make_option('--format', choices=bulk.FORMATS,
+                    help='csv or json. By default the extension of the file decides.'),
+        make_option('--publish', action='store_true', default=False, help='Publish the tasks right away.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Give the file to import.')
+        path = args[0]
+        format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if format not in bulk.FORMATS:
+            raise CommandError('Use --format to tell the format of %s.' % path)
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                records = bulk.read_records(f.read(), format)
+            tasks = bulk.import_tasks(records, publish=options['publish'])
+        except IOError as e:
+            raise CommandError('Can not read %s: %s' % (path, e))
+        except bulk.TaskImportError as e:
+            raise CommandError('Nothing was imported.\n%s' % e)
+        self.stdout.write('Imported %d task(s).' % len(tasks))
@@ -0,0 +1,16 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from sidrun.search import rebuild_search_index
+
+
+class Command(NoArgsCommand):
+    help = 'Recomputes the search documents of all tasks and accepted tasks and refills the full text index.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', type='int', default=500, help='Number of rows updated per transaction.'),
+    )
+
+    def handle_noargs(self, **options):
+        tasks, intern_tasks = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write('Indexed %d task(s) and %d accepted task(s).' % (tasks, intern_tasks))
@@ -0,0 +1,11 @@
+from django.core.management.base import NoArgsCommand
+
+from sidrun.models import Task
+
+
+class Command(NoArgsCommand):
+    help = 'Recounts the active, finished and abandoned counters of all tasks from the accepted tasks.'
+
+    def handle_noargs(self, **options):
+        updated = Task.objects.rebuild_counters()
+        self.stdout.write('Rebuilt counters of %d task(s).' % updated)
@@ -0,0 +1,35 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from sidrun import notifications
+
+
+class Command(NoArgsCommand):
+    help = 'Queues reminders of accepted tasks that are due soon and notices of expired ones, and sends the ' \
+           'queued notifications by email in batches. Several workers can run at once on PostgreSQL only.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', type='int', default=100, help='Number of notifications claimed at once.'),
+        make_option('--max-batches', type='int', default=None, help='Stop after this many batches.'),
+        make_option('--no-queue', action='store_true', default=False,
+                    help='Only send, e.g. when another worker queues.'),
+        make_option('--loop', action='store_true', default=False, help='Keep running instead of exiting.'),
+        make_option('--interval', type='int', default=60, help='Seconds between rounds with --loop.'),
+    )
+
+    def handle_noargs(self, **options):
+        while True:
+            if not options['no_queue']:
+                due_soon, expired = notifications.queue_notifications()
+                self.stdout.write('Queued %d reminder(s) and %d expiry notice(s).' % (due_soon, expired))
+            sent, retried, failed, seconds = notifications.send_pending(options['batch_size'],
+                                                                        options['max_batches'])
+            self.stdout.write('Sent %d, retrying %d, failed %d in %.2fs (%.1f/s).' % (
+                sent, retried, failed, seconds, sent / seconds if seconds else 0))
+            sizes = notifications.queue_sizes()
+            self.stdout.write('Queue: %s' % ', '.join('%s %d' % (label, sizes.get(status, 0))
+                                                     for status, label in notifications.Notification.STATUSES))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
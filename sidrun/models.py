@@ -1,13 +1,27 @@
-from django.contrib.auth.models import User
+import sys
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.contrib.auth.models import User, Group
+from django.core.signals import request_started
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction, connections, router
+from django.db.models import F
+from django.db.models.query import QuerySet
+from django.db.models.signals import post_init, pre_save, post_save, post_delete, m2m_changed, post_syncdb
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 
+from sidrun import roles, indexes, fragments, search, images, summary, db
+from sidrun.instrumentation import timed
+
 
 class Type(models.Model):
     name = models.CharField(max_length=25, unique=True)
     icon = models.ImageField(upload_to='./type_icons/', null=True)
+    # names of the sized copies of the icon, see sidrun.images
+    icon_hash = models.CharField(max_length=16, blank=True, default='', editable=False)
+    icon_has_webp = models.BooleanField(default=False, editable=False)
 
     def __unicode__(self):
         return self.name
@@ -15,6 +29,9 @@ class Type(models.Model):
     def __str__(self):
         return self.name
 
+    def icon_html(self):
+        return images.icon_html(self)
+
 
 class Tag(models.Model):
     name = models.CharField(max_length=25, unique=True)
@@ -26,6 +43,80 @@ class Tag(models.Model):
         return self.name
 
 
+# Time until which a task can be accepted and still be finished before its deadline, compared with _NOW_SQL. The
+# PostgreSQL expression is indexed by sidrun_task_accepting_until, see sidrun.indexes; an index expression has to
+# be immutable, which arithmetic on a timestamp with time zone is not, so it works on the UTC time.
+_ACCEPTING_UNTIL_SQL = {
+    'postgresql': "((sidrun_task.deadline AT TIME ZONE 'UTC') - interval '1 hour' * sidrun_task.time_to_complete_task)",
+    'sqlite': "(CAST(strftime('%%s', sidrun_task.deadline) AS integer) - 3600 * sidrun_task.time_to_complete_task)",
+}
+_NOW_SQL = {
+    'postgresql': "(now() AT TIME ZONE 'UTC')",
+    'sqlite': "CAST(strftime('%%s', 'now') AS integer)",
+}
+
+
+class TaskQuerySet(QuerySet):
+    def open_for_accepting(self):
+        """
+        Filters published tasks that can still be finished before their deadline when accepted now.
+        """
+        vendor = connections[self.db].vendor
+        return self.filter(start_date__lte=timezone.now()) \
+            .extra(where=['%s > %s' % (_ACCEPTING_UNTIL_SQL[vendor], _NOW_SQL[vendor])])
+
+
+class TaskManager(models.Manager):
+    def get_queryset(self):
+        return TaskQuerySet(self.model, using=self._db)
+
+    def open_for_accepting(self):
+        return self.get_queryset().open_for_accepting()
+
+    def adjust_counters(self, task_id, **deltas):
+        """
+        Atomically adds the given deltas to the status counters of a task, e.g. active_count=1, abandoned_count=-1.
+        """
+        changes = dict((field, F(field) + delta) for field, delta in deltas.items())
+        return self.filter(pk=task_id).update(updated_at=timezone.now(), **changes)
+
+    def rebuild_counters(self):
+        """
+        Recounts the status counters of all tasks from the intern tasks. Returns the number of updated tasks.
+        """
+        assignments = ', '.join('%s = (%s)' % (field, _count_interntasks_sql(status))
+                                for status, field in InternTask.STATUS_COUNTERS.items())
+        using = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            cursor = connections[using].cursor()
+            cursor.execute('UPDATE sidrun_task SET updated_at = %s, ' + assignments, [timezone.now()])
+            return cursor.rowcount
+
+    def counter_mismatches(self):
+        """
+        Returns a list of (task id, counter field, stored value, actual value) for counters that are out of sync.
+        """
+        mismatches = []
+        for status, field in InternTask.STATUS_COUNTERS.items():
+            cursor = connections[self.db].cursor()
+            cursor.execute('SELECT id, %s, (%s) AS actual FROM sidrun_task WHERE %s != (%s) ORDER BY id' % (
+                field, _count_interntasks_sql(status), field, _count_interntasks_sql(status)))
+            mismatches.extend((task_id, field, stored, actual) for task_id, stored, actual in cursor.fetchall())
+        return sorted(mismatches)
+
+
+def accepted_count_expression():
+    """
+    Returns an expression for the number of positions taken in a task, to be used in filters and updates.
+    """
+    return F('active_count') + F('finished_count') + F('overtime_count')
+
+
+def _count_interntasks_sql(status):
+    return "SELECT COUNT(*) FROM sidrun_interntask " \
+           "WHERE sidrun_interntask.task_id = sidrun_task.id AND sidrun_interntask.status = '%s'" % status
+
+
 class Task(models.Model):
     title = models.CharField(max_length=140)
     type = models.ForeignKey(Type)
@@ -55,8 +146,38 @@ class Task(models.Model):
     require_references = models.BooleanField(default=True)
     require_videos = models.BooleanField(default=True)
 
+    # Number of intern tasks per status, maintained by services.accept_task, InternTask.change_status and
+    # InternTask.objects.expire
+    active_count = models.IntegerField(default=0, editable=False)
+    finished_count = models.IntegerField(default=0, editable=False)
+    abandoned_count = models.IntegerField(default=0, editable=False)
+    overtime_count = models.IntegerField(default=0, editable=False)
+
+    # Visible text of the title, the HTML fields and the tags, maintained by sidrun.search
+    search_document = models.TextField(default='', editable=False)
+    # Set on every save and counter change, see sidrun.conditional
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = TaskManager()
+
+    # HTML fields that are rendered through the fragment cache
+    fragment_fields = ('description', 'requirements', 'expected_results', 'extra_material')
+    counter_fields = ('active_count', 'finished_count', 'abandoned_count', 'overtime_count')
+
+    def save(self, *args, **kwargs):
+        # the counters are only changed by atomic updates, the values loaded with the task may already be stale
+        if not self._state.adding and not args and not kwargs.get('force_insert') and \
+                kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.counter_fields]
+        super(Task, self).save(*args, **kwargs)
+
+    def accepted_count(self):
+        return self.active_count + self.finished_count + self.overtime_count
+
+    @timed('Task.available_positions')
     def available_positions(self):
-        return self.number_of_positions - self.interntask_set.exclude(status=InternTask.ABANDONED).__len__()
+        return self.number_of_positions - self.accepted_count()
 
     def time_left(self):
         return self.interntask_set.first().time_left_or_ended()
@@ -71,7 +192,7 @@ class Task(models.Model):
         return ', '.join([a.name for a in self.tags.all()])
 
     def type_icon(self):
-        return '<img src="%s"/>' % self.type.icon.url
+        return self.type.icon_html()
     type_icon.allow_tags = True
 
     def title_safe(self):
@@ -80,19 +201,19 @@ class Task(models.Model):
     title_safe.allow_tags = True
 
     def description_safe(self):
-        return mark_safe(self.description)
+        return fragments.render(self, 'description')
     description_safe.short_description = "Description"
 
     def requirements_safe(self):
-        return mark_safe(self.requirements)
+        return fragments.render(self, 'requirements')
     requirements_safe.short_description = "Requirements"
 
     def expected_results_safe(self):
-        return mark_safe(self.expected_results)
+        return fragments.render(self, 'expected_results')
     expected_results_safe.short_description = "Expected results"
 
     def extra_material_safe(self):
-        return mark_safe(self.extra_material)
+        return fragments.render(self, 'extra_material')
     extra_material_safe.short_description = "Extra material"
 
     class Meta:
@@ -120,7 +241,103 @@ def create_user_profile(sender, instance, created, **kwargs):
         profile, created = Profile.objects.get_or_create(user=instance)
 
 
+def set_updated_at(sender, instance, raw=False, **kwargs):
+    # loaddata keeps the time in the fixture
+    if not raw:
+        instance.updated_at = timezone.now()
+
+
 post_save.connect(create_user_profile, sender=User)
+post_init.connect(images.remember_icon_name, sender=Type)
+post_save.connect(images.update_icon_derivatives_after_save, sender=Type)
+m2m_changed.connect(roles.forget_group_names, sender=User.groups.through)
+post_save.connect(roles.forget_all_group_names, sender=Group)
+post_delete.connect(roles.forget_all_group_names, sender=Group)
+post_syncdb.connect(indexes.create_indexes_after_syncdb, sender=sys.modules[__name__])
+request_started.connect(db.check_kept_connections)
+
+
+# SQL for the time an intern task is due, used to fill in due_at of intern tasks created before it was stored
+_DUE_AT_SQL = {
+    'postgresql': "(sidrun_interntask.time_started + interval '1 hour' * "
+                  "(SELECT sidrun_task.time_to_complete_task FROM sidrun_task "
+                  "WHERE sidrun_task.id = sidrun_interntask.task_id))",
+    'sqlite': "datetime(sidrun_interntask.time_started, '+' || "
+              "(SELECT sidrun_task.time_to_complete_task FROM sidrun_task "
+              "WHERE sidrun_task.id = sidrun_interntask.task_id) || ' hours')",
+}
+_SECONDS_LEFT_SQL = {
+    'postgresql': "CAST(EXTRACT(EPOCH FROM (sidrun_interntask.due_at - now())) AS integer)",
+    'sqlite': "CAST(ROUND((julianday(sidrun_interntask.due_at) - julianday('now')) * 86400) AS integer)",
+}
+_IS_OVERTIME_SQL = {
+    'postgresql': "sidrun_interntask.due_at < now()",
+    'sqlite': "sidrun_interntask.due_at < datetime('now')",
+}
+
+
+class InternTaskQuerySet(QuerySet):
+    def with_deadline_state(self):
+        """
+        Annotates the seconds left until the task is due (seconds_left, negative when overtime) and whether
+        the task is overtime (is_overtime).
+        """
+        vendor = connections[self.db].vendor
+        return self.extra(select=OrderedDict([
+            ('seconds_left', _SECONDS_LEFT_SQL[vendor]),
+            ('is_overtime', _IS_OVERTIME_SQL[vendor]),
+        ]))
+
+    def overtime(self):
+        return self.filter(due_at__lt=timezone.now())
+
+    def not_overtime(self):
+        return self.filter(due_at__gte=timezone.now())
+
+    def fill_in_due_at(self):
+        """
+        Stores due_at of intern tasks that were created before it was stored. Returns the number of updated tasks.
+        """
+        cursor = connections[self.db].cursor()
+        cursor.execute('UPDATE sidrun_interntask SET due_at = %s WHERE due_at IS NULL'
+                       % _DUE_AT_SQL[connections[self.db].vendor])
+        return cursor.rowcount
+
+
+class InternTaskManager(models.Manager):
+    def get_queryset(self):
+        return InternTaskQuerySet(self.model, using=self._db)
+
+    def with_deadline_state(self):
+        return self.get_queryset().with_deadline_state()
+
+    def overtime(self):
+        return self.get_queryset().overtime()
+
+    def expire(self, batch_size=500):
+        """
+        Moves unfinished tasks that are past their due time to the overtime status in batches, ending them at
+        their due time. Returns the number of expired tasks per task id.
+        """
+        expired = {}
+        while True:
+            with transaction.atomic():
+                batch = list(self.get_queryset().select_for_update()
+                             .filter(status=InternTask.UNFINISHED).overtime()
+                             .order_by('due_at').values_list('id', 'task_id')[:batch_size])
+                if not batch:
+                    return expired
+                self.filter(id__in=[intern_task_id for intern_task_id, task_id in batch]) \
+                    .update(status=InternTask.OVERTIME, time_ended=F('due_at'))
+                expired_in_batch = {}
+                for intern_task_id, task_id in batch:
+                    expired_in_batch[task_id] = expired_in_batch.get(task_id, 0) + 1
+                for task_id, n_expired in expired_in_batch.items():
+                    Task.objects.adjust_counters(task_id, active_count=-n_expired, overtime_count=n_expired)
+                    expired[task_id] = expired.get(task_id, 0) + n_expired
+
+    def not_overtime(self):
+        return self.get_queryset().not_overtime()
 
 
 class InternTask(models.Model):
@@ -129,19 +346,76 @@ class InternTask(models.Model):
     UNFINISHED = 'UF'
     FINISHED = 'FI'
     ABANDONED = 'AB'
+    OVERTIME = 'OT'
     STATUSES = (
         (UNFINISHED, 'Unfinished'),
         (FINISHED, 'Finished'),
-        (ABANDONED, 'Abandoned')
+        (ABANDONED, 'Abandoned'),
+        (OVERTIME, 'Overtime')
     )
+    STATUS_COUNTERS = {
+        UNFINISHED: 'active_count',
+        FINISHED: 'finished_count',
+        ABANDONED: 'abandoned_count',
+        OVERTIME: 'overtime_count'
+    }
     status = models.CharField(max_length=2, choices=STATUSES)
     time_started = models.DateTimeField(auto_now_add=True)
     time_ended = models.DateTimeField(null=True, blank=True)
+    due_at = models.DateTimeField(null=True, editable=False)
+    # incremented on every save of the submission, so autosave can detect stale writes
+    version = models.IntegerField(default=0, editable=False)
     summary_pitch = models.TextField(null=True, blank=True)
     body = models.TextField(null=True, blank=True)
     conclusion = models.TextField(null=True, blank=True)
     references = models.TextField(null=True, blank=True)
     videos = models.TextField(null=True, blank=True)
+    # Visible text of the task title, the user name and the submission, maintained by sidrun.search
+    search_document = models.TextField(default='', editable=False)
+
+    objects = InternTaskManager()
+
+    def save(self, *args, **kwargs):
+        if self.due_at is None:
+            self.due_at = (self.time_started or timezone.now()) + timedelta(hours=self.task.time_to_complete_task)
+        super(InternTask, self).save(*args, **kwargs)
+
+    def get_seconds_left(self):
+        """
+        Returns the seconds left to complete the task, negative when overtime. Uses the value annotated by
+        with_deadline_state() when the task was loaded with it.
+        """
+        seconds_left = getattr(self, 'seconds_left', None)
+        if seconds_left is None and self.due_at:
+            seconds_left = int((self.due_at - timezone.now()).total_seconds())
+        return seconds_left
+
+    @timed('InternTask.overtime')
+    def overtime(self):
+        is_overtime = getattr(self, 'is_overtime', None)
+        if is_overtime is None:
+            seconds_left = self.get_seconds_left()
+            is_overtime = seconds_left is not None and seconds_left < 0
+        return bool(is_overtime)
+
+    def change_status(self, status):
+        """
+        Moves the task to the given status and updates the counters of the task in the same transaction.
+        Returns False if the status was already changed by someone else.
+        """
+        time_ended = timezone.now()
+        with transaction.atomic():
+            changed = InternTask.objects.filter(pk=self.pk, status=self.status) \
+                .update(status=status, time_ended=time_ended)
+            if changed:
+                Task.objects.adjust_counters(self.task_id, **{self.STATUS_COUNTERS[self.status]: -1,
+                                                              self.STATUS_COUNTERS[status]: 1})
+        if changed:
+            self.status = status
+            self.time_ended = time_ended
+            # the search document does not contain the status, so it stays as it is
+            summary.forget_summary(self.user_id)
+        return bool(changed)
 
     def summary_pitch_safe(self):
         return mark_safe(self.summary_pitch)
@@ -178,32 +452,45 @@ class InternTask(models.Model):
         return mark_safe(self.task.title)
 
     def description(self):
-        return mark_safe(self.task.description)
+        return self.task.description_safe()
 
     def requirements(self):
-        return mark_safe(self.task.requirements)
+        return self.task.requirements_safe()
 
     def submission_type(self):
         return Task.submission_type_dict.get(self.task.submission_type)
 
     def expected_results(self):
-        return mark_safe(self.task.expected_results)
+        return self.task.expected_results_safe()
 
     def extra_material(self):
-        return mark_safe(self.task.extra_material)
+        return self.task.extra_material_safe()
 
     def deadline(self):
         return self.task.deadline
 
     class Meta:
         unique_together = ('task', 'user',)
+        index_together = [('status', 'due_at')]
         verbose_name = 'Accepted task'
         verbose_name_plural = 'Accepted tasks'
 
 
+def release_task_counter(sender, instance, **kwargs):
+    field = InternTask.STATUS_COUNTERS.get(instance.status)
+    if field:
+        Task.objects.adjust_counters(instance.task_id, **{field: -1})
+
+
+post_delete.connect(release_task_counter, sender=InternTask)
+
+
 class HelpText(models.Model):
     heading = models.CharField(max_length=100)
     content = models.TextField()
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    fragment_fields = ('content',)
 
     def __unicode__(self):
         return mark_safe(self.heading)
@@ -213,7 +500,7 @@ class HelpText(models.Model):
     heading_safe.short_description = "Heading"
 
     def content_safe(self):
-        return mark_safe(self.content)
+        return fragments.render(self, 'content')
     content_safe.short_description = "Content"
 
 
@@ -221,4 +508,60 @@ class AdminHelpText(HelpText):
     class Meta:
         proxy = True
         verbose_name = 'help text (admin)'
-        verbose_name_plural = 'help texts (admin)'
\ No newline at end of file
+        verbose_name_plural = 'help texts (admin)'
+
+
+class Notification(models.Model):
+    """
+    An email to a user, queued by sidrun.notifications and sent by the send_notifications command.
+    """
+    DUE_SOON = 'DS'
+    EXPIRED = 'EX'
+    KINDS = (
+        (DUE_SOON, 'Due soon'),
+        (EXPIRED, 'Expired'),
+    )
+    PENDING = 'PE'
+    SENT = 'SE'
+    FAILED = 'FA'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+    user = models.ForeignKey(User)
+    intern_task = models.ForeignKey(InternTask, null=True, on_delete=models.SET_NULL)
+    kind = models.CharField(max_length=2, choices=KINDS)
+    # the same notification is only queued once
+    key = models.CharField(max_length=100, unique=True)
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=2, choices=STATUSES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    # pending notifications are sent from this time on; a claimed one is not sent again before it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        index_together = [('status', 'next_attempt_at')]
+
+    def __str__(self):
+        return '%s to %s' % (self.get_kind_display(), self.user)
+
+
+for model in (Task, AdminTask, HelpText, AdminHelpText):
+    pre_save.connect(set_updated_at, sender=model)
+    post_save.connect(fragments.prime_fragments, sender=model)
+    post_delete.connect(fragments.forget_fragments, sender=model)
+
+for model in (Task, AdminTask):
+    post_init.connect(search.remember_task_title, sender=model)
+    pre_save.connect(search.update_task_document, sender=model)
+    post_save.connect(search.reindex_intern_tasks_of_task, sender=model)
+pre_save.connect(search.update_intern_task_document, sender=InternTask)
+for model in (Task, AdminTask, InternTask):
+    post_save.connect(search.index_saved_document, sender=model)
+    post_delete.connect(search.unindex_deleted_document, sender=model)
+m2m_changed.connect(search.reindex_tasks_of_changed_tags, sender=Task.tags.through)
@@ -0,0 +1,193 @@
+"""
+Email reminders of accepted tasks that are due soon and notices of accepted tasks that ran out of time.
+
+queue_notifications finds the accepted tasks that need a notification with two due time queries and queues one
+Notification per task and kind; the unique key of a notification keeps it from being queued twice. The
+send_notifications command sends the queue in batches. A batch is claimed by moving its next_attempt_at past a
+lease, with SELECT ... FOR UPDATE SKIP LOCKED on PostgreSQL so that parallel workers claim different rows, and is
+sent through one connection of the configured email backend. SQLite has no row locks, so only one worker may run on
+it. Failed notifications are retried with exponential backoff until MAX_ATTEMPTS.
+
+A due reminder is enough for the deadline of the task as well: an accepted task is always due before the deadline
+of its task.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import mail
+from django.core.urlresolvers import reverse
+from django.db import connection, transaction, IntegrityError
+from django.db.models import F, Q, Count
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from sidrun.models import InternTask, Notification
+from sidrun.search import strip_html
+
+# hours before the due time an accepted task is reminded of, tasks with no more hours to complete are reminded half
+# way through
+REMINDER_HOURS = getattr(settings, 'SIDRUN_NOTIFICATION_REMINDER_HOURS', 6)
+# accepted tasks that ran out of time longer ago than this are not notified any more
+EXPIRED_HOURS = getattr(settings, 'SIDRUN_NOTIFICATION_EXPIRED_HOURS', 24)
+MAX_ATTEMPTS = getattr(settings, 'SIDRUN_NOTIFICATION_MAX_ATTEMPTS', 5)
+# seconds before the first retry, doubled for every further one
+RETRY_DELAY = getattr(settings, 'SIDRUN_NOTIFICATION_RETRY_DELAY', 60)
+# seconds a claimed batch is left to its worker before others may send it
+CLAIM_LEASE = getattr(settings, 'SIDRUN_NOTIFICATION_CLAIM_LEASE', 300)
+SITE_URL = getattr(settings, 'SIDRUN_SITE_URL', '')
+
+_CLAIM_SQL = {
+    'postgresql': 'SELECT id FROM sidrun_notification WHERE status = %s AND next_attempt_at <= %s '
+                  'ORDER BY next_attempt_at LIMIT %s FOR UPDATE SKIP LOCKED',
+    # SQLite has no row locks, so two workers could claim the same rows: parallel workers are PostgreSQL-only
+    'sqlite': 'SELECT id FROM sidrun_notification WHERE status = %s AND next_attempt_at <= %s '
+              'ORDER BY next_attempt_at LIMIT %s',
+}
+
+_KINDS = {
+    Notification.DUE_SOON: ('due-soon:%(id)d:%(due)d', 'Your task "%(title)s" is due soon',
+                            'sidrun/notifications/due_soon.txt'),
+    Notification.EXPIRED: ('expired:%(id)d', 'The time for your task "%(title)s" is up',
+                           'sidrun/notifications/expired.txt'),
+}
+
+
+def due_soon(now):
+    reminded = Q(task__time_to_complete_task__gt=REMINDER_HOURS, due_at__lte=now + timedelta(hours=REMINDER_HOURS))
+    for hours in range(1, REMINDER_HOURS + 1):
+        reminded |= Q(task__time_to_complete_task=hours, due_at__lte=now + timedelta(hours=hours / 2))
+    return InternTask.objects.filter(reminded, status=InternTask.UNFINISHED, due_at__gt=now)
+
+
+def expired(now):
+    return InternTask.objects.filter(status__in=(InternTask.UNFINISHED, InternTask.OVERTIME), due_at__lte=now,
+                                     due_at__gt=now - timedelta(hours=EXPIRED_HOURS))
+
+
+def _notification(kind, intern_task):
+    key, subject, template = _KINDS[kind]
+    title = strip_html(intern_task.task.title)
+    values = {'id': intern_task.pk, 'due': int(intern_task.due_at.timestamp()), 'title': title}
+    url = SITE_URL + reverse('admin:sidrun_interntask_change', args=(intern_task.pk,))
+    body = render_to_string(template, {'intern_task': intern_task, 'title': title, 'url': url})
+    return Notification(user=intern_task.user, intern_task=intern_task, kind=kind, key=key % values,
+                        subject=subject % values, body=body)
+
+
+def queue(kind, intern_tasks):
+    """
+    Queues a notification of the kind for every accepted task that has none yet. Returns the number queued.
+    """
+    # the due time of an accepted task does not change, so it gets one notification of each kind
+    queued = Notification.objects.filter(kind=kind, intern_task__isnull=False).values('intern_task')
+    notifications = [_notification(kind, intern_task) for intern_task in
+                     intern_tasks.filter(user__email__gt='').exclude(pk__in=queued).select_related('task', 'user')]
+    if not notifications:
+        return 0
+    try:
+        with transaction.atomic():
+            Notification.objects.bulk_create(notifications)
+    except IntegrityError:
+        # another worker queued some of them in the meantime
+        created = 0
+        for notification in notifications:
+            try:
+                with transaction.atomic():
+                    notification.save()
+                created += 1
+            except IntegrityError:
+                pass
+        return created
+    return len(notifications)
+
+
+def queue_notifications(now=None):
+    """
+    Queues the reminders of accepted tasks due soon and the notices of expired ones. Returns the numbers of both.
+    """
+    now = now or timezone.now()
+    return queue(Notification.DUE_SOON, due_soon(now)), queue(Notification.EXPIRED, expired(now))
+
+
+def claim(batch_size, now=None):
+    """
+    Returns up to batch_size pending notifications that are due to be sent, claimed for CLAIM_LEASE seconds.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        cursor = connection.cursor()
+        cursor.execute(_CLAIM_SQL[connection.vendor], [Notification.PENDING, now, batch_size])
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return []
+        Notification.objects.filter(pk__in=ids) \
+            .update(attempts=F('attempts') + 1, next_attempt_at=now + timedelta(seconds=CLAIM_LEASE))
+    return list(Notification.objects.filter(pk__in=ids).select_related('user').order_by('pk'))
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def _failed(notification, error, now):
+    if notification.attempts >= MAX_ATTEMPTS:
+        changes = {'status': Notification.FAILED}
+    else:
+        changes = {'next_attempt_at': now + retry_delay(notification.attempts)}
+    Notification.objects.filter(pk=notification.pk).update(last_error='%s: %s' % (error.__class__.__name__, error),
+                                                           **changes)
+    return notification.attempts >= MAX_ATTEMPTS
+
+
+def send_batch(notifications):
+    """
+    Sends the notifications through one connection of the email backend. Returns the numbers of sent, retried and
+    failed notifications.
+    """
+    backend = mail.get_connection()
+    sent = []
+    errors = []
+    try:
+        backend.open()
+    except Exception as e:
+        errors = [(notification, e) for notification in notifications]
+    else:
+        try:
+            for notification in notifications:
+                message = mail.EmailMessage(notification.subject, notification.body, to=[notification.user.email],
+                                            connection=backend)
+                try:
+                    message.send()
+                except Exception as e:
+                    errors.append((notification, e))
+                else:
+                    sent.append(notification.pk)
+        finally:
+            backend.close()
+    now = timezone.now()
+    Notification.objects.filter(pk__in=sent).update(status=Notification.SENT, sent_at=now, last_error='')
+    given_up = sum(_failed(notification, error, now) for notification, error in errors)
+    return len(sent), len(errors) - given_up, given_up
+
+
+def send_pending(batch_size=100, max_batches=None):
+    """
+    Sends pending notifications batch by batch until none are due or max_batches were sent. Returns the numbers of
+    sent, retried and failed notifications and the seconds it took.
+    """
+    start = time.time()
+    totals = [0, 0, 0]
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        notifications = claim(batch_size)
+        if not notifications:
+            break
+        for i, n in enumerate(send_batch(notifications)):
+            totals[i] += n
+        batches += 1
+    return tuple(totals) + (time.time() - start,)
+
+
+def queue_sizes():
+    return dict(Notification.objects.values_list('status').annotate(n=Count('id')).order_by())
@@ -0,0 +1,38 @@
+import re
+
+from django.core.paginator import Paginator
+from django.db import connections
+
+_ROWS_ESTIMATE = re.compile(r'rows=(\d+)')
+
+
+def estimate_count(queryset):
+    """
+    Returns the planner's estimate of the number of rows in the queryset, or None when the database can't tell.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    cursor = connection.cursor()
+    cursor.execute('EXPLAIN ' + sql, params)
+    match = _ROWS_ESTIMATE.search(cursor.fetchone()[0])
+    return int(match.group(1)) if match else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the query planner's row estimate instead of an exact COUNT(*) for large result sets,
+    so showing a page does not scan the whole table.
+    """
+    exact_count_limit = 10000
+
+    def _get_count(self):
+        if self._count is None:
+            estimate = estimate_count(self.object_list)
+            if estimate is None or estimate < self.exact_count_limit:
+                self._count = self.object_list.count()
+            else:
+                self._count = estimate
+        return self._count
+    count = property(_get_count)
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+
+ADMINS = 'admins'
+INTERNS = 'interns'
+
+CACHE_TIMEOUT = 60 * 60
+_GENERATION_KEY = 'sidrun:roles:generation'
+
+
+def _cache_is_shared():
+    # a cache in the memory of every process would keep the old groups in the processes that did not see the change
+    return not isinstance(cache, LocMemCache)
+
+
+def _cache_key(user_id):
+    return 'sidrun:roles:%d:%d' % (cache.get(_GENERATION_KEY, 0), user_id)
+
+
+def get_group_names(user):
+    """
+    Returns the names of the groups of the user.
+
+    The names are remembered on the user object, which lives as long as the request, so role checks cost at most
+    one query per request. When the cache is shared by all processes, they are also kept in it until the groups of
+    the user change.
+    """
+    group_names = getattr(user, '_group_names', None)
+    if group_names is None:
+        if not user.is_authenticated():
+            group_names = frozenset()
+        elif not _cache_is_shared():
+            group_names = frozenset(user.groups.values_list('name', flat=True))
+        else:
+            key = _cache_key(user.pk)
+            group_names = cache.get(key)
+            if group_names is None:
+                group_names = frozenset(user.groups.values_list('name', flat=True))
+                cache.set(key, group_names, CACHE_TIMEOUT)
+        user._group_names = group_names
+    return group_names
+
+
+def user_is_admin(user):
+    return ADMINS in get_group_names(user)
+
+
+def user_is_intern(user):
+    return INTERNS in get_group_names(user)
+
+
+def forget_group_names(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear') or not _cache_is_shared():
+        return
+    if reverse and pk_set is None:
+        # all users were removed from a group
+        forget_all_group_names()
+    else:
+        user_ids = pk_set if reverse else [instance.pk]
+        cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def forget_all_group_names(**kwargs):
+    if not _cache_is_shared():
+        return
+    try:
+        cache.incr(_GENERATION_KEY)
+    except ValueError:
+        cache.set(_GENERATION_KEY, 1, None)
@@ -0,0 +1,165 @@
+"""
+Full text search over tasks and accepted tasks.
+
+Every task and accepted task keeps the visible text of its HTML fields in search_document, which is updated when
+the object is saved. PostgreSQL searches it through a GIN index on to_tsvector('simple', search_document); SQLite
+keeps a copy of the documents in an FTS5 table named after the table of the model. Both are created by the
+create_indexes command, and rebuild_search_index fills in the documents of existing rows. Other databases, and SQLite
+without FTS5, scan the documents instead.
+"""
+import re
+from html.parser import HTMLParser
+
+from django.db import connections, router, transaction
+
+from sidrun.indexes import has_fts5
+
+WORD_REGEX = re.compile(r'\w+', re.UNICODE)
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.parts = []
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def strip_html(html):
+    parser = _TextExtractor()
+    parser.feed(html or '')
+    parser.close()
+    return ' '.join(parser.parts)
+
+
+def _document(parts):
+    return ' '.join(' '.join(parts).split())
+
+
+def task_document(task, tag_names=None):
+    parts = [strip_html(task.title), strip_html(task.description), strip_html(task.requirements),
+             strip_html(task.expected_results), strip_html(task.extra_material)]
+    if tag_names is None and task.pk:
+        tag_names = [tag.name for tag in task.tags.all()]
+    parts.extend(tag_names or [])
+    return _document(parts)
+
+
+def intern_task_document(intern_task):
+    return _document([strip_html(intern_task.task.title), intern_task.user.get_username(),
+                      strip_html(intern_task.summary_pitch), strip_html(intern_task.body),
+                      strip_html(intern_task.conclusion)])
+
+
+def _fts_table(model):
+    return model._meta.db_table + '_fts'
+
+
+def index_document(model, pk, document, using=None):
+    """
+    Copies the document into the full text table on SQLite. PostgreSQL indexes the column itself.
+    """
+    connection = connections[using or router.db_for_write(model)]
+    if has_fts5(connection):
+        table = _fts_table(model)
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % table, [pk])
+        cursor.execute('INSERT INTO %s (rowid, search_document) VALUES (%%s, %%s)' % table, [pk, document])
+
+
+def search(queryset, query):
+    """
+    Returns the objects of the queryset whose search document contains every word of the query, or a word
+    starting with it, with their relevance as search_rank.
+    """
+    words = [word.lower() for word in WORD_REGEX.findall(query)]
+    if not words:
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        document = "to_tsvector('simple', %s.search_document)" % table
+        tsquery = ' & '.join(word + ':*' for word in words)
+        return queryset.extra(select={'search_rank': "ts_rank(%s, to_tsquery('simple', %%s))" % document},
+                              select_params=[tsquery],
+                              where=["%s @@ to_tsquery('simple', %%s)" % document], params=[tsquery])
+    if has_fts5(connection):
+        fts_table = _fts_table(queryset.model)
+        match = ' '.join('"%s"*' % word for word in words)
+        return queryset.extra(
+            select={'search_rank': '(SELECT -rank FROM %s WHERE %s MATCH %%s AND rowid = %s.id)'
+                                   % (fts_table, fts_table, table)},
+            select_params=[match],
+            where=['%s.id IN (SELECT rowid FROM %s WHERE %s MATCH %%s)' % (table, fts_table, fts_table)],
+            params=[match])
+    for word in words:
+        queryset = queryset.filter(search_document__icontains=word)
+    return queryset.extra(select={'search_rank': '0'})
+
+
+def update_task_document(sender, instance, **kwargs):
+    instance.search_document = task_document(instance)
+
+
+def update_intern_task_document(sender, instance, **kwargs):
+    instance.search_document = intern_task_document(instance)
+
+
+def index_saved_document(sender, instance, using, **kwargs):
+    index_document(sender, instance.pk, instance.search_document, using)
+
+
+def unindex_deleted_document(sender, instance, using, **kwargs):
+    connection = connections[using]
+    if has_fts5(connection):
+        connection.cursor().execute('DELETE FROM %s WHERE rowid = %%s' % _fts_table(sender), [instance.pk])
+
+
+def remember_task_title(sender, instance, **kwargs):
+    # a deferred title is not loaded, and counts as changed
+    instance._search_title = instance.__dict__.get('title')
+
+
+def reindex_intern_tasks_of_task(sender, instance, created, **kwargs):
+    # accepted tasks repeat the title of the task
+    if not created and instance.title != instance._search_title:
+        from sidrun.models import InternTask
+        reindex(InternTask.objects.filter(task=instance).select_related('task', 'user'), intern_task_document)
+    instance._search_title = instance.title
+
+
+def reindex_tasks_of_changed_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    from sidrun.models import Task
+    if reverse:
+        if action == 'pre_clear':
+            instance._search_task_ids = list(instance.task_set.values_list('pk', flat=True))
+            return
+        task_ids = instance.__dict__.pop('_search_task_ids', None) if action == 'post_clear' else pk_set
+    else:
+        task_ids = [instance.pk]
+    if action in ('post_add', 'post_remove', 'post_clear') and task_ids:
+        reindex(Task.objects.filter(pk__in=task_ids).prefetch_related('tags'), task_document)
+
+
+def reindex(queryset, document, batch_size=500):
+    """
+    Recomputes the search documents of the objects in the queryset without saving the objects.
+    """
+    ids = list(queryset.values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic(using=queryset.db):
+            for obj in queryset.filter(pk__in=ids[start:start + batch_size]):
+                text = document(obj)
+                queryset.model._default_manager.using(queryset.db).filter(pk=obj.pk).update(search_document=text)
+                index_document(queryset.model, obj.pk, text, queryset.db)
+    return len(ids)
+
+
+def rebuild_search_index(batch_size=500):
+    """
+    Recomputes the search documents of all tasks and accepted tasks. Returns the numbers of both.
+    """
+    from sidrun.models import Task, InternTask
+    return (reindex(Task.objects.prefetch_related('tags'), task_document, batch_size),
+            reindex(InternTask.objects.select_related('task', 'user'), intern_task_document, batch_size))
@@ -0,0 +1,63 @@
+from django.db import transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from sidrun.models import InternTask, Profile, Task, accepted_count_expression
+from sidrun.summary import forget_summary
+
+
+class TaskAcceptanceError(Exception):
+    pass
+
+
+class PendingTaskLimitReached(TaskAcceptanceError):
+    def __init__(self, allowed_number_of_tasks, n_pending_tasks):
+        super(PendingTaskLimitReached, self).__init__(
+            'You are allowed to have %d pending tasks. You already have %d pending task(s)! ' % (
+                allowed_number_of_tasks, n_pending_tasks))
+
+
+class AlreadyAccepted(TaskAcceptanceError):
+    def __init__(self):
+        super(AlreadyAccepted, self).__init__('You already have this task!')
+
+
+class NoPositionsLeft(TaskAcceptanceError):
+    def __init__(self, task):
+        super(NoPositionsLeft, self).__init__('There are no positions left for task %s!' % task.title)
+
+
+def count_pending_tasks(user):
+    """
+    Returns the number of unfinished tasks of the user that are not overtime.
+    """
+    return InternTask.objects.filter(user=user, status=InternTask.UNFINISHED).not_overtime().count()
+
+
+def accept_task(task, user):
+    """
+    Assigns the task to the user and returns the new intern task.
+
+    The profile row of the user is locked for the duration of the transaction, so parallel accepts of the same
+    user are serialized and the pending task limit holds. The position is reserved with a conditional UPDATE on
+    the task counters, which the database serializes per task, so the task can not be oversubscribed.
+    Raises a TaskAcceptanceError subclass when the task can not be accepted.
+    """
+    with transaction.atomic():
+        profile = Profile.objects.select_for_update().get(user=user)
+        n_pending_tasks = count_pending_tasks(user)
+        if profile.allowed_number_of_tasks <= n_pending_tasks:
+            raise PendingTaskLimitReached(profile.allowed_number_of_tasks, n_pending_tasks)
+        if InternTask.objects.filter(task=task, user=user).exists():
+            raise AlreadyAccepted()
+        reserved = Task.objects \
+            .filter(pk=task.pk, number_of_positions__gt=accepted_count_expression()) \
+            .update(active_count=F('active_count') + 1, updated_at=timezone.now())
+        if not reserved:
+            raise NoPositionsLeft(task)
+        try:
+            intern_task = InternTask.objects.create(task=task, user=user, status=InternTask.UNFINISHED)
+        except IntegrityError:
+            raise AlreadyAccepted()
+    forget_summary(user.pk)
+    return intern_task
@@ -0,0 +1,71 @@
+var autosave = document.getElementById("autosave");
+if (autosave) {
+    var autosave_fields = ["summary_pitch", "body", "conclusion", "references", "videos"];
+    var autosave_version = autosave.getAttribute("data-version");
+    var autosave_form = autosave.parentNode;
+    while (autosave_form && autosave_form.tagName !== "FORM") {
+        autosave_form = autosave_form.parentNode;
+    }
+    var saved_values = {};
+
+    // summernote copies its content into the hidden textarea only when the editor loses focus, so the content is
+    // read from the editor in the iframe of the textarea once it is ready
+    function editor_code(field) {
+        var frame = document.getElementById(field.id.replace(/-/g, "_") + "_iframe");
+        var frame_window = frame && frame.contentWindow;
+        if (!frame_window || !frame_window.jQuery || !frame_window.jQuery(".note-editor").length) {
+            return null;
+        }
+        return frame_window.jQuery("#summernote").code();
+    }
+
+    function field_value(name) {
+        var field = autosave_form.elements[name];
+        if (!field) {
+            return null;
+        }
+        var code = field.id ? editor_code(field) : null;
+        return code !== null ? code : field.value;
+    }
+
+    autosave_fields.forEach(function (name) {
+        saved_values[name] = field_value(name);
+    });
+
+    function saveChanges() {
+        var changes = {};
+        var params = [];
+        autosave_fields.forEach(function (name) {
+            var value = field_value(name);
+            if (value !== null && value !== saved_values[name]) {
+                changes[name] = value;
+                params.push(encodeURIComponent(name) + "=" + encodeURIComponent(value));
+            }
+        });
+        if (!params.length) {
+            return;
+        }
+        params.push("version=" + encodeURIComponent(autosave_version));
+        params.push("csrfmiddlewaretoken=" + encodeURIComponent(field_value("csrfmiddlewaretoken")));
+
+        var request = new XMLHttpRequest();
+        request.open("POST", autosave.getAttribute("data-url"));
+        request.setRequestHeader("Content-Type", "application/x-www-form-urlencoded");
+        request.onload = function () {
+            var response = JSON.parse(request.responseText);
+            if (request.status === 200) {
+                autosave_version = response.version;
+                for (var name in changes) {
+                    saved_values[name] = changes[name];
+                }
+                autosave.textContent = "Draft saved at " + new Date().toLocaleTimeString();
+            } else {
+                clearInterval(autosave_timer);
+                autosave.textContent = response.error;
+            }
+        };
+        request.send(params.join("&"));
+    }
+
+    var autosave_timer = setInterval(saveChanges, 5000);
+}
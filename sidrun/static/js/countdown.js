@@ -1,34 +1,110 @@
-var countdown = document.getElementById("countdown")
-if (countdown) {
-    var node_containing_countdown = countdown.nextSibling;
-    var countown_text = node_containing_countdown.nodeValue;
-    var time_left_splitted = countown_text.split(":");
-    var hours = time_left_splitted[0];
-    var minutes = time_left_splitted[1];
-    var seconds = time_left_splitted[2];
-    var milliseconds_left = hours * 3600 * 1000 + minutes * 60 * 1000 + seconds * 1000;
-    var target_date = new Date().getTime() + milliseconds_left;
-
-    function myTimer() {
-        // variables for time units
-        var days, hours, minutes, seconds;
-        // find the amount of "seconds" between now and target
-        var current_date = new Date().getTime();
-        var seconds_left = (target_date - current_date) / 1000;
+// Keeps the countdowns rendered by Dashboard.time_left_or_ended and the statuses rendered by Dashboard.status_label
+// up to date. Countdowns tick from their absolute due time, corrected by the clock of the server, and the status
+// view is polled for changed statuses.
+(function () {
+    var UNFINISHED = "UF";
+    var OVERTIME = "OT";
+    var POLL_INTERVAL = 30000;
+    var live_status = document.getElementById("live-status");
+    var countdowns = document.querySelectorAll(".countdown[data-id]");
+    if (!countdowns.length) {
+        return;
+    }
+    // milliseconds the clock of the server is ahead of the clock of the browser
+    var clock_offset = 0;
+    var etag = null;
 
-        // do some time calculations
+    // formatted like Dashboard.time_left_or_ended
+    function time_left_text(milliseconds_left) {
+        var seconds_left = Math.floor(milliseconds_left / 1000);
+        var hours = Math.floor(seconds_left / 3600);
+        var minutes = Math.floor(seconds_left % 3600 / 60);
+        var seconds = seconds_left % 60;
+        return hours + ":" + minutes + ":" + seconds;
+    }
 
-        hours = parseInt(seconds_left / 3600);
-        seconds_left = seconds_left % 3600;
+    // the server renders every countdown, only running ones and those whose status or due time changed are
+    // rendered again
+    function render(countdown) {
+        var due = countdown.getAttribute("data-due");
+        var text = "Overtime!";
+        if (due) {
+            var milliseconds_left = Number(due) - (new Date().getTime() + clock_offset);
+            if (milliseconds_left >= 0) {
+                text = time_left_text(milliseconds_left);
+            }
+        }
+        if (countdown.textContent !== text) {
+            countdown.textContent = text;
+        }
+    }
 
-        minutes = parseInt(seconds_left / 60);
-        seconds = parseInt(seconds_left % 60);
+    function tick() {
+        for (var i = 0; i < countdowns.length; i++) {
+            if (countdowns[i].getAttribute("data-status") === UNFINISHED) {
+                render(countdowns[i]);
+            }
+        }
+    }
 
-        node_containing_countdown.nodeValue = hours + ":" + minutes + ":" + seconds;
+    function update(data) {
+        data.tasks.forEach(function (task) {
+            var id = task[0], status = task[1], due = task[2] ? String(task[2]) : "", ended = task[3];
+            var elements = document.querySelectorAll('[data-id="' + id + '"]');
+            for (var i = 0; i < elements.length; i++) {
+                var element = elements[i];
+                if (element.className === "task-status") {
+                    if (element.textContent !== data.statuses[status]) {
+                        element.textContent = data.statuses[status];
+                    }
+                } else if (element.getAttribute("data-status") !== status ||
+                           element.getAttribute("data-due") !== due) {
+                    element.setAttribute("data-status", status);
+                    element.setAttribute("data-due", due);
+                    if (status === UNFINISHED) {
+                        render(element);
+                    } else if (status === OVERTIME) {
+                        element.textContent = "Overtime!";
+                    } else if (ended) {
+                        element.textContent = ended;
+                    }
+                }
+            }
+        });
+    }
 
+    function poll() {
+        if (document.hidden) {
+            return;
+        }
+        var ids = [];
+        for (var i = 0; i < countdowns.length; i++) {
+            ids.push(countdowns[i].getAttribute("data-id"));
+        }
+        var request = new XMLHttpRequest();
+        var sent_at = new Date().getTime();
+        request.open("GET", live_status.getAttribute("data-url") + "?ids=" + ids.join(","));
+        if (etag) {
+            request.setRequestHeader("If-None-Match", etag);
+        }
+        request.onload = function () {
+            var server_time = request.getResponseHeader("X-Server-Time");
+            if (server_time) {
+                // the server answered about half way through the request
+                clock_offset = Number(server_time) - (sent_at + new Date().getTime()) / 2;
+            }
+            if (request.status === 200) {
+                etag = request.getResponseHeader("ETag");
+                update(JSON.parse(request.responseText));
+            }
+        };
+        request.send();
     }
 
-    var myVar = setInterval(function () {
-        myTimer()
-    }, 1000);
-}
\ No newline at end of file
+    tick();
+    setInterval(tick, 1000);
+    if (live_status) {
+        poll();
+        setInterval(poll, POLL_INTERVAL);
+    }
+})();
@@ -0,0 +1,88 @@
+"""
+The summary of an intern's work shown on the admin index: pending tasks against the allowed number, the task due
+next and the number of tasks the intern could accept.
+
+It is computed in one query and cached per user for SUMMARY_TIMEOUT seconds. Accepting, submitting and abandoning
+a task forget the summary of the user.
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+SUMMARY_TIMEOUT = 60
+
+_SUMMARY_SQL = """
+SELECT sidrun_profile.allowed_number_of_tasks,
+    COUNT(CASE WHEN pending.id IS NOT NULL THEN 1 END),
+    MIN(pending.due_at),
+    (SELECT upcoming.id FROM sidrun_interntask upcoming
+     WHERE upcoming.user_id = sidrun_profile.user_id AND upcoming.status = %%s AND upcoming.due_at >= %%s
+     ORDER BY upcoming.due_at LIMIT 1),
+    (SELECT sidrun_task.title FROM sidrun_interntask upcoming
+     INNER JOIN sidrun_task ON sidrun_task.id = upcoming.task_id
+     WHERE upcoming.user_id = sidrun_profile.user_id AND upcoming.status = %%s AND upcoming.due_at >= %%s
+     ORDER BY upcoming.due_at LIMIT 1),
+    (SELECT COUNT(*) FROM sidrun_task
+     WHERE sidrun_task.start_date <= %%s
+       AND sidrun_task.number_of_positions >
+           sidrun_task.active_count + sidrun_task.finished_count + sidrun_task.overtime_count
+       AND %(accepting_until)s > %(now)s
+       AND NOT EXISTS (SELECT 1 FROM sidrun_interntask accepted
+                       WHERE accepted.task_id = sidrun_task.id AND accepted.user_id = sidrun_profile.user_id))
+FROM sidrun_profile
+LEFT OUTER JOIN sidrun_interntask pending
+    ON pending.user_id = sidrun_profile.user_id AND pending.status = %%s AND pending.due_at >= %%s
+WHERE sidrun_profile.user_id = %%s
+GROUP BY sidrun_profile.id, sidrun_profile.allowed_number_of_tasks, sidrun_profile.user_id
+"""
+
+
+def _cache_key(user_id):
+    return 'sidrun:summary:%d' % user_id
+
+
+def _to_datetime(value):
+    # SQLite returns computed datetimes as text
+    if isinstance(value, str):
+        value = parse_datetime(value)
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, timezone.utc)
+    return value
+
+
+def compute_summary(user):
+    """
+    Returns the summary of the user as a dict, or None if the user has no profile.
+    """
+    from sidrun.models import InternTask, _ACCEPTING_UNTIL_SQL, _NOW_SQL
+    now = timezone.now()
+    unfinished = InternTask.UNFINISHED
+    sql = _SUMMARY_SQL % {'accepting_until': _ACCEPTING_UNTIL_SQL[connection.vendor],
+                          'now': _NOW_SQL[connection.vendor]}
+    cursor = connection.cursor()
+    cursor.execute(sql, [unfinished, now, unfinished, now, now, unfinished, now, user.pk])
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    allowed, pending, next_due_at, next_id, next_title, open_tasks = row
+    return {
+        'allowed': allowed,
+        'pending': pending,
+        'slots_left': max(allowed - pending, 0),
+        'next_task': next_id and {'id': next_id, 'title': next_title, 'due_at': _to_datetime(next_due_at)},
+        'open_tasks': open_tasks,
+    }
+
+
+def get_summary(user):
+    key = _cache_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_summary(user)
+        cache.set(key, summary, SUMMARY_TIMEOUT)
+    return summary
+
+
+def forget_summary(user_id):
+    cache.delete(_cache_key(user_id))
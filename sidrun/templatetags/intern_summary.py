@@ -0,0 +1,12 @@
+from django import template
+
+from sidrun.roles import user_is_intern
+from sidrun.summary import get_summary
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/sidrun/intern_summary.html', takes_context=True)
+def intern_summary(context):
+    user = context['user']
+    return {'summary': get_summary(user) if user_is_intern(user) else None}
@@ -1,3 +1,742 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib import admin, messages
+from django.contrib.admin.models import LogEntry, CHANGE
+from django.contrib.admin.util import display_for_value
+from django.contrib.auth.models import User, Group
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from django.utils.html import strip_tags
+from PIL import Image
+
+from sidrun import bulk, fragments, images, indexes, instrumentation, notifications, search, summary, validators
+from sidrun.benchmarks import validators as validator_benchmark
+from sidrun.models import Task, Type, InternTask, Tag, HelpText, Notification, accepted_count_expression
+from sidrun.paginators import EstimatedCountPaginator, estimate_count
+from sidrun.roles import user_is_admin
+from sidrun.services import accept_task, AlreadyAccepted, NoPositionsLeft, PendingTaskLimitReached
+from tasks import environment
+
+
+def create_task(**kwargs):
+    now = timezone.now()
+    fields = dict(title='Task', type=Type.objects.get_or_create(name='General')[0], description='description',
+                  requirements='requirements', submission_type=Task.TEXT, time_to_complete_task=24,
+                  start_date=now, deadline=now + timedelta(days=7), number_of_positions=1,
+                  expected_results='expected results')
+    fields.update(kwargs)
+    return Task.objects.create(**fields)
+
+
+def create_user(username, allowed_number_of_tasks=1):
+    user = User.objects.create_user(username, password=username)
+    user.profile.allowed_number_of_tasks = allowed_number_of_tasks
+    user.profile.save()
+    return user
+
+
+class AcceptTaskTest(TestCase):
+    def test_accepting_reserves_a_position(self):
+        task = create_task(number_of_positions=2)
+        intern_task = accept_task(task, create_user('tester'))
+        self.assertEqual(intern_task.status, InternTask.UNFINISHED)
+        self.assertEqual(Task.objects.get(pk=task.pk).available_positions(), 1)
+
+    def test_task_can_not_be_accepted_twice(self):
+        task = create_task(number_of_positions=2)
+        user = create_user('tester', allowed_number_of_tasks=2)
+        accept_task(task, user)
+        self.assertRaises(AlreadyAccepted, accept_task, task, user)
+
+    def test_pending_task_limit(self):
+        user = create_user('tester')
+        accept_task(create_task(), user)
+        self.assertRaises(PendingTaskLimitReached, accept_task, create_task(), user)
+
+    def test_no_positions_left(self):
+        task = create_task()
+        accept_task(task, create_user('first-tester'))
+        self.assertRaises(NoPositionsLeft, accept_task, task, create_user('second-tester'))
+        self.assertEqual(Task.objects.get(pk=task.pk).active_count, 1)
+
+    def test_full_counters_refuse_the_reservation(self):
+        task = create_task(number_of_positions=2)
+        # the counters are filled behind the back of the loaded task, like a parallel accept would
+        Task.objects.filter(pk=task.pk).update(active_count=2)
+        self.assertEqual(task.available_positions(), 2)
+        self.assertRaises(NoPositionsLeft, accept_task, task, create_user('tester'))
+        self.assertFalse(InternTask.objects.filter(task=task).exists())
+        self.assertEqual(Task.objects.get(pk=task.pk).active_count, 2)
+
+    def test_saving_a_loaded_task_keeps_the_counters(self):
+        task = create_task(number_of_positions=2)
+        loaded_task = Task.objects.get(pk=task.pk)
+        accept_task(task, create_user('tester'))
+        loaded_task.title = 'Changed'
+        loaded_task.save()
+        task = Task.objects.get(pk=task.pk)
+        self.assertEqual((task.title, task.active_count), ('Changed', 1))
+
+    def test_accepting_through_the_admin_does_not_save_the_task(self):
+        task = create_task(number_of_positions=2)
+        accept_task(task, create_user('first-tester'))
+        intern = create_user('second-tester')
+        User.objects.filter(pk=intern.pk).update(is_staff=True)
+        intern.groups.add(Group.objects.get(name='interns'))
+        self.client.login(username='second-tester', password='second-tester')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('admin:sidrun_task_change', args=(task.pk,)), {'_accept': 'Accept'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Task.objects.get(pk=task.pk).active_count, 2)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'UPDATE "sidrun_task" SET "title"' in query['sql']])
+
+
+class OpenForAcceptingTest(TestCase):
+    def test_tasks_that_can_not_be_finished_in_time_are_left_out(self):
+        now = timezone.now()
+        in_time = create_task(time_to_complete_task=24, deadline=now + timedelta(hours=25))
+        create_task(time_to_complete_task=24, deadline=now + timedelta(hours=23))
+        create_task(start_date=None)
+        self.assertEqual(list(Task.objects.open_for_accepting().filter(title='Task')), [in_time])
+
+
+class DeadlineStateTest(TestCase):
+    def setUp(self):
+        self.intern_task = accept_task(create_task(time_to_complete_task=72), create_user('tester'))
+
+    def test_multi_day_task_is_not_overtime(self):
+        intern_task = InternTask.objects.with_deadline_state().get(pk=self.intern_task.pk)
+        self.assertFalse(intern_task.is_overtime)
+        self.assertTrue(72 * 3600 - 60 < intern_task.seconds_left <= 72 * 3600)
+        self.assertEqual(InternTask.objects.not_overtime().count(), 1)
+
+    def test_expired_task_is_overtime(self):
+        self.expire_intern_task()
+        intern_task = InternTask.objects.with_deadline_state().get(pk=self.intern_task.pk)
+        self.assertTrue(intern_task.overtime())
+        self.assertEqual(InternTask.objects.overtime().count(), 1)
+
+    def test_expired_tasks_are_moved_to_overtime_once(self):
+        self.expire_intern_task()
+        self.assertEqual(InternTask.objects.expire(), {self.intern_task.task_id: 1})
+        self.assertEqual(InternTask.objects.expire(), {})
+        intern_task = InternTask.objects.get(pk=self.intern_task.pk)
+        self.assertEqual(intern_task.status, InternTask.OVERTIME)
+        self.assertEqual(intern_task.time_ended, intern_task.due_at)
+        self.assertEqual(Task.objects.counter_mismatches(), [])
+
+    def expire_intern_task(self):
+        InternTask.objects.filter(pk=self.intern_task.pk).update(time_started=timezone.now() - timedelta(hours=73),
+                                                                 due_at=timezone.now() - timedelta(hours=1))
+
+
+class SummaryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('tester', allowed_number_of_tasks=3)
+
+    def test_summary_is_one_query_and_forgotten_on_changes(self):
+        soon = create_task(title='Soon', time_to_complete_task=2, number_of_positions=2)
+        accept_task(create_task(title='Later', time_to_complete_task=48, number_of_positions=2), self.user)
+        intern_task = accept_task(soon, self.user)
+        n_open_tasks = Task.objects.open_for_accepting().exclude(interntask__user=self.user) \
+            .filter(number_of_positions__gt=accepted_count_expression()).count()
+        with self.assertNumQueries(1):
+            result = summary.get_summary(self.user)
+            self.assertEqual(summary.get_summary(self.user), result)
+        self.assertEqual((result['pending'], result['slots_left'], result['open_tasks']), (2, 1, n_open_tasks))
+        self.assertEqual((result['next_task']['id'], result['next_task']['title']), (intern_task.pk, 'Soon'))
+        self.assertEqual(result['next_task']['due_at'], InternTask.objects.get(pk=intern_task.pk).due_at)
+        intern_task.change_status(InternTask.ABANDONED)
+        self.assertEqual(summary.get_summary(self.user)['pending'], 1)
+
+
+class RolesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_groups_are_queried_once_and_forgotten_on_change(self):
+        user = create_user('tester')
+        with self.assertNumQueries(1):
+            self.assertFalse(user_is_admin(user))
+            self.assertFalse(user_is_admin(user))
+        user.groups.add(Group.objects.get(name='admins'))
+        self.assertTrue(user_is_admin(User.objects.get(pk=user.pk)))
+
+    def test_groups_are_not_kept_across_requests_in_a_cache_of_the_process(self):
+        user = create_user('tester')
+        user_is_admin(user)
+        user = User.objects.get(pk=user.pk)
+        with self.assertNumQueries(1):
+            self.assertFalse(user_is_admin(user))
+
+
+class FragmentTest(TestCase):
+    def test_html_is_sanitized(self):
+        html = '<p onclick="steal()">Read <a href=" javascript:steal()">this</a> &amp; that<script>steal()</script></p>' \
+               '<iframe src="//www.youtube.com/embed/x" allowfullscreen></iframe>'
+        self.assertEqual(fragments.sanitize(html), '<p>Read <a>this</a> &amp; that</p>'
+                                                   '<iframe src="//www.youtube.com/embed/x" allowfullscreen></iframe>')
+
+    def test_embedded_documents_are_dropped(self):
+        html = '<iframe srcdoc="&lt;script&gt;steal()&lt;/script&gt;"></iframe>' \
+               '<iframe src="https://example.com/">fallback</iframe>' \
+               '<object data="javascript:steal()"><embed src="x.swf"></object>' \
+               '<base href="https://example.com/"><form action="https://example.com/"><input name="q">Search</form>'
+        self.assertEqual(fragments.sanitize(html), 'Search')
+
+    def test_only_allowed_attributes_and_urls_are_kept(self):
+        html = '<a href="&#106;avascript:steal()" data-x="1">a</a>' \
+               '<a href="https://example.com/" target="_blank">b</a>' \
+               '<img src="data:image/png;base64,AAAA" style="width: 50%;"><img src="data:text/html,x">' \
+               '<p id="x" class="lead">1 &lt; 2 < 3</p>'
+        self.assertEqual(fragments.sanitize(html), '<a>a</a><a href="https://example.com/" target="_blank">b</a>'
+                                                   '<img src="data:image/png;base64,AAAA" style="width: 50%;"><img>'
+                                                   '<p class="lead">1 &lt; 2 &lt; 3</p>')
+
+    def test_only_allowed_styles_are_kept(self):
+        html = '<p style="COLOR: rgb(255, 0, 0); position: fixed; background-image: url(https://example.com/)">a</p>' \
+               '<span style="font-family: &quot;Arial Black&quot;; width: expression(steal())">b</span>' \
+               '<div style="behavior: url(x.htc)">c</div>'
+        self.assertEqual(fragments.sanitize(html), '<p style="color: rgb(255, 0, 0);">a</p>'
+                                                   '<span style="font-family: &quot;Arial Black&quot;;">b</span>'
+                                                   '<div>c</div>')
+
+    def test_rendered_html_follows_changes(self):
+        task = create_task(description='<p>First</p>')
+        self.assertEqual(Task.objects.get(pk=task.pk).description_safe(), '<p>First</p>')
+        task.description = '<p>Second</p>'
+        task.save()
+        self.assertEqual(Task.objects.get(pk=task.pk).description_safe(), '<p>Second</p>')
+
+
+class ValidatorTest(TestCase):
+    def setUp(self):
+        validators.forget_parsed_html()
+
+    def test_text_length_is_that_of_strip_tags(self):
+        for html in ('<p>Fish &amp; chips</p>', 'Fish &amp; chips', '<p>1 &lt; 2</p><!-- note -->',
+                     '&lt;b&gt;bold&lt;/b&gt;', '<p>x < y</p>'):
+            self.assertEqual(validators.parse_html(html).text_length, len(strip_tags(html)))
+
+    def test_links_are_collected(self):
+        html = '<p><a href="http://example.com/">one</a> <a href="not a url">two</a> <a name="x">three</a></p>'
+        self.assertEqual(validators.parse_html(html).links, ('http://example.com/', 'not a url'))
+        self.assertRaisesMessage(ValidationError, "'not a url' is not a valid url address.",
+                                 validators.validate_urls, html, 'references')
+        self.assertRaises(ValidationError, validators.validate_urls, '<p>no links</p>', 'references')
+
+    def test_least_recently_used_parse_is_dropped(self):
+        htmls = ['<p>%d</p>' % i for i in range(validators.PARSED_CACHE_SIZE + 1)]
+        for html in htmls[:-1]:
+            validators.parse_html(html)
+        validators.parse_html(htmls[0])
+        validators.parse_html(htmls[-1])
+        cached = [hashlib.md5(html.encode('utf-8')).digest() in validators._parsed_cache for html in htmls[:3]]
+        self.assertEqual(cached, [True, False, True])
+
+    def test_short_text_is_rejected(self):
+        self.assertRaisesMessage(ValidationError, 'Summary pitch length needs to be at least 140 characters. '
+                                                  'You have 3.', validators.validate_text_field, 'summary_pitch',
+                                 '<p><b>a</b>bc</p>')
+        validators.validate_text_field('summary_pitch', '<p>%s</p>' % ('x' * 140))
+
+    def test_benchmark_agrees_with_the_separate_passes(self):
+        html = validator_benchmark.make_html(10 * 1024)
+        self.assertEqual(validator_benchmark.validate_separately(html), validator_benchmark.validate_once(html))
+
+
+class SearchTest(TestCase):
+    def test_documents_follow_saves_and_tags(self):
+        task = create_task(title='<b>Sidrun</b> essay', description='<p>Write about &quot;autumn&quot;</p>')
+        self.assertEqual(list(search.search(Task.objects.all(), 'autum ESSAY')), [task])
+        self.assertEqual(list(search.search(Task.objects.all(), 'winter')), [])
+        task.tags.add(Tag.objects.create(name='winter'))
+        self.assertEqual(list(search.search(Task.objects.all(), 'winter')), [task])
+
+    def test_matches_are_ranked(self):
+        create_task(description='<p>river</p>')
+        best = create_task(title='river', description='<p>river river</p>')
+        self.assertEqual(search.search(Task.objects.all(), 'river').order_by('-search_rank')[0], best)
+
+    def test_submissions_are_searchable(self):
+        intern_task = accept_task(create_task(), create_user('tester'))
+        intern_task.body = '<p>Migrating birds</p>'
+        intern_task.save()
+        self.assertEqual(list(search.search(InternTask.objects.all(), 'birds tester')), [intern_task])
+
+    def test_submissions_are_reindexed_only_when_the_title_changes(self):
+        task = create_task(title='Rivers')
+        intern_task = accept_task(task, create_user('tester'))
+        task = Task.objects.get(pk=task.pk)
+        task.description = '<p>Lakes</p>'
+        with CaptureQueriesContext(connection) as queries:
+            task.save()
+        self.assertFalse([query for query in queries.captured_queries if 'sidrun_interntask' in query['sql']])
+        task.title = 'Oceans'
+        task.save()
+        self.assertEqual(list(search.search(InternTask.objects.all(), 'oceans')), [intern_task])
+
+
+    def test_without_fts5_the_documents_are_scanned(self):
+        indexes._fts5_support[connection.alias] = False
+        self.addCleanup(indexes._fts5_support.pop, connection.alias)
+        self.assertNotIn('sidrun_task_fts', indexes.create_indexes())
+        task = create_task(title='Sidrun essay')
+        self.assertEqual(list(search.search(Task.objects.all(), 'ESSAY sidr')), [task])
+
+class BulkTest(TestCase):
+    def setUp(self):
+        Type.objects.get_or_create(name='General')
+        Tag.objects.get_or_create(name='writing')
+        self.deadline = (timezone.now() + timedelta(days=7)).strftime('%Y-%m-%d %H:%M')
+
+    def csv(self, *rows):
+        lines = [','.join(bulk.IMPORT_FIELDS)]
+        lines.extend('Task %d,General,writing,<p>description</p>,requirements,Text,%d,%s,2,results,material,,no'
+                     % (i, hours, self.deadline) for i, hours in enumerate(rows))
+        return '\n'.join(lines)
+
+    def test_import_creates_and_publishes_all_tasks(self):
+        tasks = bulk.import_tasks(bulk.read_records(self.csv(24, 48), 'csv'), publish=True)
+        self.assertEqual(Task.objects.filter(pk__in=[task.pk for task in tasks], start_date__isnull=False).count(), 2)
+        task = Task.objects.get(pk=tasks[1].pk)
+        self.assertEqual((task.time_to_complete_task, task.submission_type, task.require_videos),
+                         (48, Task.TEXT, False))
+        self.assertEqual(task.tags_list(), 'writing')
+        self.assertEqual(list(search.search(Task.objects.all(), 'writing task 1')), [task])
+
+    def test_import_is_all_or_nothing(self):
+        records = bulk.read_records(self.csv(24, 24 * 30), 'csv')
+        n_tasks = Task.objects.count()
+        with self.assertRaises(bulk.TaskImportError) as raised:
+            bulk.import_tasks(records)
+        self.assertEqual(raised.exception.errors,
+                         ['Task 2: Hours to complete task has to fit between now and deadline!'])
+        self.assertEqual(Task.objects.count(), n_tasks)
+
+    def test_clone(self):
+        task = create_task()
+        task.tags.add(Tag.objects.get(name='writing'))
+        accept_task(task, create_user('tester'))
+        deadline = timezone.now() + timedelta(days=30)
+        clone, = bulk.clone_tasks(Task.objects.filter(pk=task.pk), deadline)
+        clone = Task.objects.get(pk=clone.pk)
+        self.assertEqual((clone.deadline, clone.start_date, clone.active_count), (deadline, None, 0))
+        self.assertEqual(clone.tags_list(), 'writing')
+
+
+class IconTest(TestCase):
+    def setUp(self):
+        self.storage = FileSystemStorage(tempfile.mkdtemp(), '/media/')
+
+    def tearDown(self):
+        shutil.rmtree(self.storage.location)
+
+    def create_type(self, content):
+        icon = Type._meta.get_field('icon')
+        default_storage = icon.storage
+        icon.storage = self.storage
+        self.addCleanup(setattr, icon, 'storage', default_storage)
+        type = Type(name='Icon test')
+        type.icon.save('icon.jpg', ContentFile(content), save=False)
+        type.save()
+        return type
+
+    def test_copies_are_only_made_when_the_icon_changes(self):
+        upload = io.BytesIO()
+        Image.new('RGB', (300, 150), 'red').save(upload, 'JPEG')
+        type = self.create_type(upload.getvalue())
+        self.assertEqual(Type.objects.get(pk=type.pk).icon_hash, images.icon_hash(upload.getvalue()))
+        Type.objects.filter(pk=type.pk).update(icon_hash='unchanged')
+        type = Type.objects.get(pk=type.pk)
+        type.name = 'Renamed icon test'
+        type.save()
+        self.assertEqual(Type.objects.get(pk=type.pk).icon_hash, 'unchanged')
+
+    def test_broken_icon_is_shown_as_uploaded(self):
+        with self.assertLogs('sidrun.images', 'ERROR'):
+            type = self.create_type(b'not an image')
+        type = Type.objects.get(pk=type.pk)
+        self.assertEqual(type.icon_hash, '')
+        self.assertEqual(type.icon_html(), '<img src="/media/%s" alt=""/>' % type.icon.name)
+
+    def test_icon_copies_are_sized_and_named_after_the_upload(self):
+        upload = io.BytesIO()
+        Image.new('RGB', (300, 150), 'red').save(upload, 'JPEG')
+        hash, has_webp = images.make_icon_derivatives(upload.getvalue(), self.storage)
+        self.assertEqual(hash, images.icon_hash(upload.getvalue()))
+        with self.storage.open(images.derived_name(hash, 2, 'png')) as f:
+            self.assertEqual(Image.open(f).size, (64, 64))
+        self.assertEqual(self.storage.exists(images.derived_name(hash, 1, 'webp')), has_webp)
+
+
+class DashboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin-tester', 'admin@example.com', 'admin-tester')
+        self.admin.groups.add(Group.objects.get(name='admins'))
+        self.client.login(username='admin-tester', password='admin-tester')
+        self.task = create_task(number_of_positions=100)
+
+    def assertQueryCountDoesNotDependOnRows(self, url, add_rows):
+        add_rows(1)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries_for_one_row:
+            self.client.get(url)
+        add_rows(19)
+        with self.assertNumQueries(len(queries_for_one_row)):
+            self.client.get(url)
+
+    def accept_tasks(self, n):
+        for i in range(n):
+            accept_task(self.task, create_user('tester%d' % InternTask.objects.count()))
+
+    def create_tasks(self, n):
+        for i in range(n):
+            create_task().tags.add(*Tag.objects.all()[:3])
+
+    def test_changelist_query_count_does_not_depend_on_rows(self):
+        url = reverse('admin:sidrun_interntask_changelist')
+        self.accept_tasks(1)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries_for_one_row:
+            self.client.get(url)
+        self.accept_tasks(99)
+        with self.assertNumQueries(len(queries_for_one_row)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['cl'].result_list), 100)
+
+    def test_task_changelist_query_count_does_not_depend_on_rows(self):
+        self.assertQueryCountDoesNotDependOnRows(reverse('admin:sidrun_admintask_changelist'), self.create_tasks)
+
+    def test_task_change_view_query_count_does_not_depend_on_accepted_interns(self):
+        self.assertQueryCountDoesNotDependOnRows(
+            reverse('admin:sidrun_admintask_change', args=(self.task.pk,)), self.accept_tasks)
+
+    def test_log_changelist_lists_the_entries_of_interns(self):
+        intern = create_user('tester')
+        intern.groups.add(Group.objects.get(name='interns'))
+        content_type_id = ContentType.objects.get_for_model(InternTask).pk
+        for user in (intern, self.admin, intern):
+            LogEntry.objects.log_action(user.pk, content_type_id, 1, 'Essay', CHANGE, 'Changed body.')
+        response = self.client.get(reverse('admin:admin_logentry_changelist'))
+        self.assertEqual(response.status_code, 200)
+        changelist = response.context['cl']
+        self.assertEqual([entry.user for entry in changelist.result_list], [intern, intern])
+        self.assertEqual(changelist.result_count, 2)
+        # the planner's estimate is used on PostgreSQL once the limit is passed, other databases count exactly
+        paginator = EstimatedCountPaginator(changelist.queryset, 100)
+        paginator.exact_count_limit = 0
+        estimate = estimate_count(changelist.queryset)
+        self.assertEqual(paginator.count, 2 if estimate is None else estimate)
+
+    def test_autosave_rejects_stale_versions(self):
+        intern_task = accept_task(self.task, self.admin)
+        url = reverse('admin:sidrun_interntask_autosave', args=(intern_task.pk,))
+        response = self.client.post(url, {'body': '<p>Draft</p>', 'version': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(InternTask.objects.get(pk=intern_task.pk).body, '<p>Draft</p>')
+        response = self.client.post(url, {'body': '<p>Older draft</p>', 'version': 0})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(InternTask.objects.get(pk=intern_task.pk).body, '<p>Draft</p>')
+
+    def test_submitting_a_task_that_changed_elsewhere_keeps_its_status(self):
+        intern_task = accept_task(self.task, self.admin)
+        stale_intern_task = InternTask.objects.get(pk=intern_task.pk)
+        InternTask.objects.filter(pk=intern_task.pk).update(status=InternTask.OVERTIME)
+        dashboard = admin.site._registry[InternTask]
+        request = RequestFactory().post('/', {'_submit': 'Submit'})
+        request.user = self.admin
+        request._messages = CookieStorage(request)
+        stale_intern_task.body = '<p>Final</p>'
+        dashboard.save_model(request, stale_intern_task, None, True)
+        dashboard.response_change(request, stale_intern_task)
+        intern_task = InternTask.objects.get(pk=intern_task.pk)
+        self.assertEqual((intern_task.status, intern_task.body), (InternTask.OVERTIME, '<p>Final</p>'))
+        self.assertEqual([message.level for message in request._messages], [messages.WARNING])
+
+    def test_autosaved_drafts_are_searchable(self):
+        intern_task = accept_task(self.task, self.admin)
+        self.client.post(reverse('admin:sidrun_interntask_autosave', args=(intern_task.pk,)),
+                         {'body': '<p>Migrating birds</p>', 'version': 0})
+        self.assertEqual(list(search.search(InternTask.objects.all(), 'birds')), [intern_task])
+
+    def test_changelist_search(self):
+        self.accept_tasks(2)
+        intern_task = InternTask.objects.first()
+        response = self.client.get(reverse('admin:sidrun_interntask_changelist'),
+                                   {'q': intern_task.user.username})
+        self.assertEqual([obj.pk for obj in response.context['cl'].result_list], [intern_task.pk])
+
+    def test_export_streams_every_submission(self):
+        self.accept_tasks(3)
+        InternTask.objects.update(body='<p>Essay &amp; more</p>')
+        response = self.client.post(reverse('admin:sidrun_interntask_changelist'), {
+            'action': 'export_submissions_jsonl', 'select_across': 1, 'index': 0,
+            '_selected_action': [InternTask.objects.first().pk]})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(InternTask.objects.values_list('pk', flat=True)))
+        self.assertEqual(rows[0]['body'], 'Essay & more')
+
+    def test_status_is_not_modified_until_a_status_changes(self):
+        self.accept_tasks(2)
+        intern_task = InternTask.objects.first()
+        url = reverse('admin:sidrun_interntask_status')
+        response = self.client.get(url, {'ids': '%d,x' % intern_task.pk})
+        data = json.loads(response.content.decode())
+        self.assertEqual([task[:2] for task in data['tasks']], [[intern_task.pk, InternTask.UNFINISHED]])
+        response = self.client.get(url, {'ids': intern_task.pk}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        intern_task.change_status(InternTask.FINISHED)
+        response = self.client.get(url, {'ids': intern_task.pk}, HTTP_IF_NONE_MATCH=response['ETag'])
+        task = json.loads(response.content.decode())['tasks'][0]
+        # the end time is shown as the dashboard renders it
+        self.assertEqual((task[1], task[3]), (InternTask.FINISHED, display_for_value(intern_task.time_ended)))
+
+    def test_change_view_loads_the_intern_task_once(self):
+        self.accept_tasks(1)
+        intern_task = InternTask.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:sidrun_interntask_change', args=(intern_task.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([query for query in queries.captured_queries
+                              if 'FROM "sidrun_interntask"' in query['sql']]), 1)
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.intern = create_user('tester', 2)
+        User.objects.filter(pk=self.intern.pk).update(is_staff=True)
+        self.intern.groups.add(Group.objects.get(name='interns'))
+        self.client.login(username='tester', password='tester')
+
+    def get_again(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_task_is_not_modified(self):
+        task = create_task(number_of_positions=2)
+        url = reverse('admin:sidrun_task_change', args=(task.pk,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_again(url, response).status_code, 304)
+        accept_task(task, create_user('other'))
+        self.assertEqual(self.get_again(url, response).status_code, 200)
+
+    def test_help_text_is_not_modified_until_saved(self):
+        help_text = HelpText.objects.create(heading='Help', content='<p>Read this</p>')
+        url = reverse('admin:sidrun_helptext_change', args=(help_text.pk,))
+        response = self.client.get(url)
+        self.assertEqual(self.get_again(url, response).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        help_text.content = '<p>Read this first</p>'
+        help_text.save()
+        self.assertEqual(self.get_again(url, response).status_code, 200)
+
+    def test_pages_are_not_shared_between_users(self):
+        help_text = HelpText.objects.create(heading='Help', content='<p>Read this</p>')
+        url = reverse('admin:sidrun_helptext_change', args=(help_text.pk,))
+        response = self.client.get(url)
+        other = create_user('other')
+        User.objects.filter(pk=other.pk).update(is_staff=True)
+        other.groups.add(Group.objects.get(name='interns'))
+        self.client.login(username='other', password='other')
+        self.assertEqual(self.get_again(url, response).status_code, 200)
+
+
+class BenchmarkCommandTest(TestCase):
+    def test_missing_baseline_fails_before_seeding(self):
+        baseline = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(baseline))
+        stdout = io.StringIO()
+        with self.assertRaisesRegex(CommandError, 'There is no baseline'):
+            call_command('benchmark_admin', baseline=baseline, stdout=stdout)
+        self.assertNotIn('Seeding', stdout.getvalue())
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise IOError('Connection refused')
+
+
+class NotificationTest(TestCase):
+    def setUp(self):
+        self.user = create_user('tester')
+        self.user.email = 'tester@example.com'
+        self.user.save()
+        self.intern_task = accept_task(create_task(title='<b>Essay</b>'), self.user)
+
+    def set_due_in(self, hours):
+        now = timezone.now()
+        InternTask.objects.filter(pk=self.intern_task.pk).update(due_at=now + timedelta(hours=hours),
+                                                                 time_started=now - timedelta(hours=24 - hours))
+
+    def test_reminder_is_queued_once_and_sent(self):
+        self.set_due_in(1)
+        self.assertEqual(notifications.queue_notifications(), (1, 0))
+        # the queued task is left out by the query for each kind, before anything is rendered
+        with self.assertNumQueries(2):
+            self.assertEqual(notifications.queue_notifications(), (0, 0))
+        sent, retried, failed, seconds = notifications.send_pending()
+        self.assertEqual((sent, retried, failed), (1, 0, 0))
+        self.assertEqual(mail.outbox[0].subject, 'Your task "Essay" is due soon')
+        self.assertEqual(mail.outbox[0].to, ['tester@example.com'])
+        self.assertEqual(Notification.objects.get().status, Notification.SENT)
+
+    def test_short_task_is_reminded_half_way_through(self):
+        intern_task = accept_task(create_task(time_to_complete_task=notifications.REMINDER_HOURS),
+                                  create_user('other-tester', 2))
+        User.objects.filter(pk=intern_task.user_id).update(email='other@example.com')
+        now = timezone.now()
+        half_way = timedelta(hours=notifications.REMINDER_HOURS / 2)
+        self.assertEqual(list(notifications.due_soon(now + half_way - timedelta(minutes=1))), [])
+        self.assertEqual(list(notifications.due_soon(now + half_way + timedelta(minutes=1))), [intern_task])
+        self.assertEqual(notifications.queue_notifications(now + half_way + timedelta(minutes=1)), (1, 0))
+        self.assertEqual(notifications.queue_notifications(now + half_way + timedelta(minutes=2)), (0, 0))
+
+    def test_expired_task_is_notified(self):
+        self.set_due_in(-1)
+        InternTask.objects.expire()
+        self.assertEqual(notifications.queue_notifications(), (0, 1))
+
+    @override_settings(EMAIL_BACKEND='sidrun.tests.FailingEmailBackend')
+    def test_failed_notifications_are_retried_with_backoff(self):
+        self.set_due_in(1)
+        notifications.queue_notifications()
+        self.assertEqual(notifications.send_pending()[:3], (0, 1, 0))
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, Notification.PENDING)
+        self.assertGreater(notification.next_attempt_at, timezone.now() + timedelta(seconds=30))
+        self.assertEqual(notifications.claim(10), [])
+        Notification.objects.update(attempts=notifications.MAX_ATTEMPTS - 1, next_attempt_at=timezone.now())
+        self.assertEqual(notifications.send_pending()[:3], (0, 0, 1))
+        self.assertEqual(Notification.objects.get().status, Notification.FAILED)
+
+
+class EnvironmentTest(TestCase):
+    def test_connections_are_kept_and_checked_by_default(self):
+        databases, health_checks = environment.database_settings({'SIDRUN_DB_USER': 'sidrun'}, '/srv')
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], environment.DEFAULT_CONN_MAX_AGE)
+        self.assertEqual(databases['default']['USER'], 'sidrun')
+        self.assertTrue(health_checks)
+
+    def test_pooler_gets_a_new_connection_per_request(self):
+        databases, health_checks = environment.database_settings({'SIDRUN_DB_POOLER': 'pgbouncer'}, '/srv')
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(databases['default']['PORT'], '6432')
+        self.assertFalse(health_checks)
+
+    def test_sessions_are_cached_only_in_a_shared_cache(self):
+        self.assertEqual(environment.session_engine({}), 'django.contrib.sessions.backends.db')
+        self.assertEqual(environment.session_engine({'SIDRUN_CACHE_LOCATION': '127.0.0.1:11211'}),
+                         'django.contrib.sessions.backends.cached_db')
+        self.assertRaises(ImproperlyConfigured, environment.session_engine, {'SIDRUN_SESSION_ENGINE': 'file'})
+
+
+@override_settings(SIDRUN_INSTRUMENTATION=True, SIDRUN_INSTRUMENTATION_SAMPLE_RATE=1)
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentation.reset_stats()
+        admin = User.objects.create_superuser('admin-tester', 'admin@example.com', 'admin-tester')
+        admin.groups.add(Group.objects.get(name='admins'))
+        self.client.login(username='admin-tester', password='admin-tester')
+
+    def test_sampled_requests_are_summed_up(self):
+        task = create_task()
+        accept_task(task, create_user('tester'))
+        with self.assertLogs('sidrun.instrumentation') as logs:
+            self.client.get(reverse('admin:sidrun_admintask_change', args=(task.pk,)))
+            stats = json.loads(self.client.get(reverse('sidrun_instrumentation')).content.decode())
+        self.assertEqual(json.loads(logs.records[0].getMessage())['view'], 'sidrun_admintask_change')
+        view = stats['views']['sidrun_admintask_change']
+        self.assertEqual(view['count'], 1)
+        self.assertGreater(view['sql_count'], 0)
+        self.assertGreater(view['template_ms'], 0)
+        self.assertIn('AcceptedInterntasks.overtime', stats['functions'])
+
+    def test_unresolved_requests_share_one_view(self):
+        with self.assertLogs('sidrun.instrumentation') as logs:
+            for path in ('/no/such/page/', '/no/such/page/either/'):
+                self.assertEqual(self.client.get(path).status_code, 404)
+        self.assertEqual(json.loads(logs.records[1].getMessage())['path'], '/no/such/page/either/')
+        self.assertEqual(instrumentation.get_stats()['views'][instrumentation.UNRESOLVED_VIEW]['count'], 2)
+        self.assertEqual(len(instrumentation.get_stats()['views']), 1)
+
+    def test_stats_are_only_shown_to_admins(self):
+        create_user('tester')
+        self.client.login(username='tester', password='tester')
+        User.objects.filter(username='tester').update(is_staff=True)
+        with self.assertLogs('sidrun.instrumentation'):
+            self.assertEqual(self.client.get(reverse('sidrun_instrumentation')).status_code, 403)
+
+    def test_timed_calls_through_outside_recorded_requests(self):
+        self.assertEqual(instrumentation.timed('double')(lambda x: 2 * x)(2), 4)
+        self.assertEqual(instrumentation.get_stats()['functions'], {})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs a database with row level locking')
+class ConcurrentAcceptTaskTest(TransactionTestCase):
+    n_threads = 20
+
+    def tearDown(self):
+        # the flush after the test creates the content types again with new ids, the cached ones must not be used
+        # for the permissions created with them
+        ContentType.objects.clear_cache()
+
+    def accept_in_parallel(self, task_user_pairs):
+        results = []
+        barrier = threading.Barrier(len(task_user_pairs))
+
+        def accept(task, user):
+            try:
+                barrier.wait()
+                results.append(accept_task(task, user))
+            except (AlreadyAccepted, NoPositionsLeft, PendingTaskLimitReached) as e:
+                results.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=accept, args=pair) for pair in task_user_pairs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [result for result in results if isinstance(result, InternTask)]
+
+    def test_positions_are_not_oversubscribed(self):
+        task = create_task(number_of_positions=3)
+        users = [create_user('tester%d' % i) for i in range(self.n_threads)]
+        accepted = self.accept_in_parallel([(task, user) for user in users])
+        self.assertEqual(len(accepted), 3)
+        self.assertEqual(InternTask.objects.filter(task=task).count(), 3)
+        self.assertEqual(Task.objects.get(pk=task.pk).active_count, 3)
+
+    def test_pending_task_limit_holds(self):
+        user = create_user('tester', allowed_number_of_tasks=2)
+        tasks = [create_task(number_of_positions=5) for i in range(self.n_threads)]
+        accepted = self.accept_in_parallel([(task, user) for task in tasks])
+        self.assertEqual(len(accepted), 2)
+        self.assertEqual(InternTask.objects.filter(user=user).count(), 2)
@@ -0,0 +1,136 @@
+"""
+Validation of the HTML that interns submit, used by CustomForm, and of task schedules, shared by AddTaskForm and
+the bulk import and clone in sidrun.bulk.
+
+The patterns are compiled once per process and every HTML field is parsed once to get both the length of its
+visible text, as django.utils.html.strip_tags counts it, and the links in it. One parse takes about as long as the
+separate passes did; what it saves is parsing the same submission again when it is previewed and saved.
+"""
+import hashlib
+import re
+from collections import namedtuple, OrderedDict
+from html.parser import HTMLParser
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.encoding import force_text
+from django.utils.html import strip_tags
+
+URL_REGEX = re.compile(
+    r'^(?:http|ftp)s?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}|'  # ...or ipv4
+    r'\[?[A-F0-9]*:[A-F0-9:]+\]?)'  # ...or ipv6
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+ParsedHTML = namedtuple('ParsedHTML', ['text_length', 'links'])
+
+# number of parsed HTML fields kept, by a digest of the HTML so that the submissions themselves are not kept; the
+# least recently used one is dropped first
+PARSED_CACHE_SIZE = 128
+_parsed_cache = OrderedDict()
+
+
+class _SubmissionParser(HTMLParser):
+    """
+    Collects the text the way one pass of strip_tags does, and the href attributes of all tags.
+    """
+    def __init__(self):
+        # the defaults, like strip_tags
+        HTMLParser.__init__(self)
+        self.text = []
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        self.links.extend(value for name, value in attrs if name == 'href' and value)
+
+    handle_startendtag = handle_starttag
+
+    def handle_data(self, data):
+        self.text.append(data)
+
+    def handle_entityref(self, name):
+        self.text.append('&%s;' % name)
+
+    def handle_charref(self, name):
+        self.text.append('&#%s;' % name)
+
+
+def _parse_html(html):
+    parser = _SubmissionParser()
+    parser.feed(html)
+    parser.close()
+    text = ''.join(parser.text)
+    if '<' not in html and '>' not in html:
+        # strip_tags returns HTML without tags as it is
+        text = html
+    elif text != html:
+        # strip_tags strips again until nothing changes
+        text = strip_tags(text)
+    return ParsedHTML(len(text), tuple(parser.links))
+
+
+def parse_html(html):
+    """
+    Returns the visible text length and the links of the HTML. Saving and previewing the same submission parse
+    it only once.
+    """
+    html = force_text(html or '')
+    key = hashlib.md5(html.encode('utf-8')).digest()
+    parsed = _parsed_cache.get(key)
+    if parsed is None:
+        parsed = _parse_html(html)
+        if len(_parsed_cache) >= PARSED_CACHE_SIZE:
+            _parsed_cache.popitem(last=False)
+        _parsed_cache[key] = parsed
+    else:
+        _parsed_cache.move_to_end(key)
+    return parsed
+
+
+def forget_parsed_html():
+    _parsed_cache.clear()
+
+
+def validate_text_length(html, min_length, name):
+    text_length = parse_html(html).text_length
+    if text_length < min_length:
+        raise ValidationError("%s length needs to be at least %d characters. You have %d." % (
+            name, min_length, text_length))
+
+
+def validate_urls(html, name):
+    links = parse_html(html).links
+    if not links:
+        raise ValidationError(
+            "There needs to be at least one url address in %s. Please use the link icon to add one!" % name)
+    validation_errors = [ValidationError("'%s' is not a valid url address." % link)
+                         for link in links if not URL_REGEX.search(link)]
+    if validation_errors:
+        raise ValidationError(validation_errors)
+
+
+# name and minimum visible text length of the text fields of a submission
+TEXT_FIELDS = {
+    'summary_pitch': ('Summary pitch', 140),
+    'body': ('Body', 280),
+    'conclusion': ('Conclusion', 140),
+}
+
+
+def validate_text_field(field, html):
+    name, min_length = TEXT_FIELDS[field]
+    validate_text_length(html, min_length, name)
+
+
+def validate_deadline(deadline, now=None):
+    if deadline and deadline < (now or timezone.now()):
+        raise ValidationError("Please enter a deadline that is not in the past!")
+
+
+def validate_schedule(deadline, time_to_complete_task, now=None):
+    hours_between_dates = (deadline - (now or timezone.now())).total_seconds() / 3600
+    if time_to_complete_task > hours_between_dates:
+        raise ValidationError("Hours to complete task has to fit between now and deadline!")
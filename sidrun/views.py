@@ -1,3 +1,36 @@
-from django.shortcuts import render
+import json
+import time
 
-# Create your views here.
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.utils.http import http_date
+from django.views.static import serve
+
+from sidrun import images, instrumentation
+from sidrun.roles import user_is_admin
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """
+    Serves media files like django.views.static.serve when DEBUG is on. The sized icon copies never change under
+    their names, so browsers may keep them for a year, as they may when the front-end server serves them.
+    """
+    response = serve(request, path, document_root, show_indexes)
+    if response.status_code == 200 and path.startswith(images.DERIVED_DIR + '/'):
+        response['Cache-Control'] = 'public, max-age=%d' % images.CACHE_MAX_AGE
+        response['Expires'] = http_date(time.time() + images.CACHE_MAX_AGE)
+    return response
+
+
+@admin.site.admin_view
+def instrumentation_stats(request):
+    """
+    Returns the request and function timings recorded by this process as JSON, to admins only.
+    """
+    if not user_is_admin(request.user):
+        raise PermissionDenied
+    if request.method == 'POST':
+        instrumentation.reset_stats()
+    return HttpResponse(json.dumps(instrumentation.get_stats(), indent=2, sort_keys=True),
+                        content_type='application/json')
@@ -0,0 +1,109 @@
+"""
+Database, session and cache settings read from the environment.
+
+SIDRUN_DB_ENGINE          postgresql (the default) or sqlite, e.g. for running the tests without PostgreSQL.
+SIDRUN_DB_NAME            name of the database, or path of the SQLite file. Defaults to tasks and db.sqlite3.
+SIDRUN_DB_USER            defaults to the user running the process.
+SIDRUN_DB_PASSWORD
+SIDRUN_DB_HOST            defaults to localhost.
+SIDRUN_DB_PORT            defaults to 5432, or 6432 behind pgbouncer.
+SIDRUN_DB_POOLER          pgbouncer when the connections go through a pgbouncer, which then keeps the connections
+                          to PostgreSQL open. Django closes its connection to the pooler after every request.
+SIDRUN_DB_CONN_MAX_AGE    seconds a connection is kept open for the next requests of the same process, 0 to close
+                          it after every request. Defaults to 600, or 0 behind a pooler.
+SIDRUN_DB_HEALTH_CHECKS   1 or 0; whether a kept connection is checked at the start of every request, so that one
+                          dropped by the database is replaced instead of failing the request. Defaults to 1 for
+                          kept connections.
+SIDRUN_CACHE_LOCATION     host:port of a memcached (needs python-memcached) shared by all processes. Defaults to
+                          a cache in the memory of every process.
+SIDRUN_SESSION_ENGINE     db, cached_db, cache or signed_cookies. Defaults to cached_db with a shared cache and to
+                          db without. cache and cached_db need a shared cache when there are several processes.
+"""
+import getpass
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+SQLITE = 'sqlite'
+POSTGRESQL = 'postgresql'
+PGBOUNCER = 'pgbouncer'
+DEFAULT_CONN_MAX_AGE = 600
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+def _flag(environ, name, default):
+    value = environ.get(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_settings(environ, base_dir):
+    """
+    Returns the DATABASES setting and whether kept connections are health checked.
+    """
+    engine = environ.get('SIDRUN_DB_ENGINE', POSTGRESQL)
+    if engine == SQLITE:
+        database = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': environ.get('SIDRUN_DB_NAME', os.path.join(base_dir, 'db.sqlite3')),
+        }
+        return {'default': database}, False
+    if engine != POSTGRESQL:
+        raise ImproperlyConfigured('SIDRUN_DB_ENGINE has to be %s or %s, not %r.' % (POSTGRESQL, SQLITE, engine))
+    pooler = environ.get('SIDRUN_DB_POOLER', '')
+    if pooler not in ('', PGBOUNCER):
+        raise ImproperlyConfigured('SIDRUN_DB_POOLER has to be %s or empty, not %r.' % (PGBOUNCER, pooler))
+    conn_max_age = int(environ.get('SIDRUN_DB_CONN_MAX_AGE', 0 if pooler else DEFAULT_CONN_MAX_AGE))
+    database = {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': environ.get('SIDRUN_DB_NAME', 'tasks'),
+        # os.getlogin() needs a controlling terminal, which process managers do not give
+        'USER': environ.get('SIDRUN_DB_USER') or getpass.getuser(),
+        'PASSWORD': environ.get('SIDRUN_DB_PASSWORD', ''),
+        'HOST': environ.get('SIDRUN_DB_HOST', 'localhost'),
+        'PORT': environ.get('SIDRUN_DB_PORT', '6432' if pooler else '5432'),
+        'CONN_MAX_AGE': conn_max_age,
+    }
+    return {'default': database}, _flag(environ, 'SIDRUN_DB_HEALTH_CHECKS', conn_max_age != 0)
+
+
+def cache_settings(environ):
+    """
+    Returns the CACHES setting, with the default cache and the cache of task fragments in memcached when
+    SIDRUN_CACHE_LOCATION is set.
+    """
+    location = environ.get('SIDRUN_CACHE_LOCATION')
+    if location:
+        return {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+                'LOCATION': location,
+            },
+            'fragments': {
+                'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+                'LOCATION': location,
+            },
+        }
+    return {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'fragments': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sidrun-fragments',
+        },
+    }
+
+
+def session_engine(environ):
+    name = environ.get('SIDRUN_SESSION_ENGINE') or ('cached_db' if environ.get('SIDRUN_CACHE_LOCATION') else 'db')
+    if name not in SESSION_ENGINES:
+        raise ImproperlyConfigured('SIDRUN_SESSION_ENGINE has to be one of %s, not %r.' % (
+            ', '.join(sorted(SESSION_ENGINES)), name))
+    return SESSION_ENGINES[name]
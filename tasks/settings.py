@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/1.6/ref/settings/
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 import os
 
+from tasks import environment
+
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
 MEDIA_ROOT = BASE_DIR + "/media/"
@@ -45,6 +47,7 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'sidrun.instrumentation.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,15 +64,51 @@ WSGI_APPLICATION = 'tasks.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/1.6/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
-        'NAME': 'tasks',
-        'USER': os.getlogin(),
-        'PASSWORD': '',
-        'HOST': 'localhost',
-        'PORT': '5432'
-    }
+DATABASES, SIDRUN_DB_HEALTH_CHECKS = environment.database_settings(os.environ, BASE_DIR)
+
+# Cache
+# https://docs.djangoproject.com/en/1.6/topics/cache/
+# Set SIDRUN_CACHE_LOCATION to share the cache, and with it the rendered task HTML and the sessions, between
+# processes.
+
+CACHES = environment.cache_settings(os.environ)
+SIDRUN_FRAGMENT_CACHE = 'fragments'
+
+# Sessions
+# https://docs.djangoproject.com/en/1.6/topics/http/sessions/
+
+SESSION_ENGINE = environment.session_engine(os.environ)
+
+# Notifications, see sidrun.notifications
+# https://docs.djangoproject.com/en/1.6/topics/email/
+# Use django.core.mail.backends.console.EmailBackend to print the emails instead of sending them.
+
+EMAIL_BACKEND = os.environ.get('SIDRUN_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('SIDRUN_FROM_EMAIL', 'webmaster@localhost')
+SIDRUN_SITE_URL = os.environ.get('SIDRUN_SITE_URL', 'http://localhost:8000')
+
+# Request instrumentation, see sidrun.instrumentation
+# The timings of the sampled requests are logged as JSON lines and summed up at /instrumentation/.
+
+SIDRUN_INSTRUMENTATION = False
+SIDRUN_INSTRUMENTATION_SAMPLE_RATE = 0.1
+SIDRUN_INSTRUMENTATION_LOG_THRESHOLD = 0
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'sidrun.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
 # Internationalization
@@ -3,6 +3,7 @@ from django.conf.urls import patterns, include, url
 from django.contrib import admin
 from tasks import settings
 from django.conf.urls.static import static
+from sidrun.views import serve_media, instrumentation_stats
 
 admin.autodiscover()
 
@@ -11,5 +12,15 @@ urlpatterns = patterns('',
     # url(r'^$', 'tasks.views.home', name='home'),
     # url(r'^blog/', include('blog.urls')),
     (r'^summernote/', include('django_summernote.urls')),
+    url(r'^instrumentation/$', instrumentation_stats, name='sidrun_instrumentation'),
     url(r'', include(admin.site.urls)),
-) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+)
+# Media files are only served by Django when DEBUG is on. Otherwise the front-end server serves MEDIA_ROOT at
+# MEDIA_URL, and the sized type icons in MEDIA_ROOT/type_icons/derived with far future cache headers, e.g. nginx:
+#
+#     location /media/type_icons/derived/ {
+#         alias /path/to/media/type_icons/derived/;
+#         expires max;
+#         add_header Cache-Control public;
+#     }
+urlpatterns += static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)